@@ -0,0 +1,136 @@
+import json
+import math
+import os
+from app.algorithms.optimization_algorithm import OptimizationAlgorithm
+from app.utils.domains import variable_value
+from app.utils.iterations import EXPLORED_MESSAGE
+from app.utils.problem_schema import problem_schema
+from app.utils.problem_store import get_store
+from app.utils.state_index import arrangement_index
+
+
+def next_combination(combination, n):
+    """ The k-combination of range(n) that follows combination in lexicographic order, or None after the last """
+    k = len(combination)
+    for i in range(k - 1, -1, -1):
+        if combination[i] < n - k + i:
+            following = combination[:i] + [combination[i] + 1]
+            return following + list(range(following[-1] + 1, following[-1] + k - i))
+    return None
+
+
+def nth_permutation(items, rank):
+    """ The permutation of items with the given rank in lexicographic order (factorial number system) """
+    items = list(items)
+    result = []
+    for remaining in range(len(items), 0, -1):
+        index, rank = divmod(rank, math.factorial(remaining - 1))
+        result.append(items.pop(index))
+    return result
+
+
+class CombinationSpace:
+    """
+    Every state of a problem, in the sense of calculate_number_of_possible_states.
+
+    A state uses num_vars_per_state of the variables, each set to one of its
+    values; a locked value counts as its only value. When order matters the
+    chosen variables are also arranged, except those with a locked order or
+    value, which keep their place. States are generated lazily, subset by
+    subset (lexicographic), arrangement by arrangement (factorial number
+    system) and value by value (mixed radix), so the position in the stream
+    is a small cursor from which generation restarts directly.
+    """
+
+    def __init__(self, schema, iteration):
+        self.schema = schema
+        self.num_vars = iteration['num_vars_per_state']
+        self.order_matters = iteration['order_matters'] == "Yes"
+        variables = iteration['variables']
+        self.fixed_digits = {i: schema.codec.digit(i, variable_value(var)) for i, var in enumerate(variables) if var.get('lock_value')}
+        self.fixed_slots = [self.order_matters and bool(var.get('lock_order') or var.get('lock_value')) for var in variables]
+
+    def signature(self):
+        # Identifies the space a cursor belongs to; changing a lock starts the enumeration over
+        return [self.num_vars, self.order_matters, sorted(self.fixed_digits.items()), self.fixed_slots]
+
+    def states(self, cursor=None):
+        """ Yield (cursor, arrangement) pairs from cursor on; an arrangement lists (position, digit) pairs in state order """
+        n = len(self.schema)
+        if not 0 < self.num_vars <= n:
+            return
+        subset = list(cursor['subset']) if cursor else list(range(self.num_vars))
+        first_arrangement = cursor['arrangement'] if cursor else 0
+        first_values = cursor['values'] if cursor else 0
+        while subset is not None:
+            free = [i for i in subset if not self.fixed_slots[i]] if self.order_matters else []
+            radices = [1 if i in self.fixed_digits else self.schema.radices[i] for i in subset]
+            value_count = math.prod(radices)
+            for arrangement in range(first_arrangement, math.factorial(len(free))):
+                permuted = iter(nth_permutation(free, arrangement))
+                order = [next(permuted) if i in free else i for i in subset]
+                for values in range(first_values, value_count):
+                    digits = {}
+                    rest = values
+                    for i, radix in zip(subset, radices):
+                        rest, digit = divmod(rest, radix)
+                        digits[i] = self.fixed_digits.get(i, digit)
+                    yield {"subset": subset, "arrangement": arrangement, "values": values}, tuple((i, digits[i]) for i in order)
+                first_values = 0
+            first_arrangement = 0
+            subset = next_combination(subset, n)
+
+
+class ExhaustiveSearch(OptimizationAlgorithm):
+    """
+    "Test Every Combination": suggests every state of the problem once.
+
+    States stream from a CombinationSpace; tested ones are skipped through the
+    store's arrangement index. The cursor of the last suggestion is kept in
+    memory and in a small file next to the problem, so after a restart the
+    enumeration resumes where it stopped instead of starting over.
+    """
+    # Skipped states between two progress reports
+    progress_interval = 10000
+
+    def __init__(self):
+        self.cursor = None
+        self.cursor_path = None
+        self.signature = None
+
+    def checkpoint_path(self, filename):
+        base = os.path.splitext(os.path.basename(filename))[0]
+        return os.path.join(os.path.dirname(filename), "cursors", f"{base}.json")
+
+    def load_cursor(self, path, signature):
+        if self.cursor_path != path or self.signature != signature:
+            self.cursor_path, self.signature, self.cursor = path, signature, None
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    saved = json.load(f)
+                if saved.get("signature") == signature:
+                    self.cursor = saved["cursor"]
+        return self.cursor
+
+    def save_cursor(self, cursor):
+        self.cursor = cursor
+        os.makedirs(os.path.dirname(self.cursor_path), exist_ok=True)
+        temp_path = self.cursor_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({"signature": self.signature, "cursor": cursor}, f, separators=(',', ':'))
+        os.replace(temp_path, self.cursor_path)
+
+    def next_parameters(self, filename):
+        store = get_store(filename)
+        schema = problem_schema(store)
+        tested_states = arrangement_index(store)
+        space = CombinationSpace(schema, store.iterations[-1])
+        # The suggestion at the cursor is tried again in case its result was never recorded
+        cursor = self.load_cursor(self.checkpoint_path(filename), json.loads(json.dumps(space.signature())))
+        for skipped, (cursor, arrangement) in enumerate(space.states(cursor)):
+            if skipped % self.progress_interval == 0:
+                self.report_progress(f"Skipping tested states ({skipped})")
+            if arrangement not in tested_states:
+                self.save_cursor(cursor)
+                return {schema.names[i]: schema.domains[i][digit] for i, digit in arrangement}
+        return EXPLORED_MESSAGE
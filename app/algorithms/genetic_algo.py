@@ -1,86 +1,192 @@
-import json
+import os
 import random
+import numpy as np
+from app.algorithms.optimization_algorithm import OptimizationAlgorithm
+from app.utils.iterations import EXPLORED_MESSAGE
+from app.utils.problem_store import get_store, iteration_utility
+from app.utils.problem_schema import problem_schema
+from app.utils.state_index import tested_state_index
 
-def load_data(filename):
-    with open(filename, 'r') as file:
-        return json.load(file)
+class GeneticAlgo(OptimizationAlgorithm):
+    """
+    Generational genetic algorithm over the digits of StateCodec codes.
 
-class GeneticAlgo:
-    def __init__(self):
-        self.population = []
-        self.parents = []
-        # self.iteration_count = 0
+    The population is a (population_size, variables) array of digits and its
+    fitness a float array, NaN until the individual has been evaluated. Each
+    suggestion is the next unevaluated individual; once the whole generation
+    has a fitness, the next one is bred in a handful of array operations:
+    elitism, tournament selection, uniform crossover and typed mutation
+    (Numerical values step to a neighbouring value, Boolean and Categorical
+    ones jump to any other value). Locked values never change. The population
+    is persisted next to the problem file so it survives restarts.
+    """
+    population_size = 20
+    tournament_size = 3
+    elite_count = 2
+    crossover_rate = 0.9
+    # Chance that each variable of a child mutates; None means one variable per child on average
+    mutation_rate = None
+    max_breeding_rounds = 100
+
+    def __init__(self, population_size=None, seed=None):
+        if population_size is not None:
+            self.population_size = population_size
+        if seed is None:
+            # Follow numpy's global seed, so that a seeded run is reproducible without passing one
+            seed = int(np.random.randint(2 ** 31))
+        self.rng = np.random.default_rng(seed)
+        # Draws over codes that may not fit in 64 bits
+        self.random = random.Random(seed)
+        self.codec = None
+        self.population = None
+        self.fitness = None
+        self.generation = 0
+        # utilities of every recorded state, keyed by state code
+        self.utilities = {}
+        self.recorded_count = 0
         self.initialized = False
 
-    # we need to start out with a population greater than 1, here we chose 4
+    def population_path(self, filename):
+        base = os.path.splitext(os.path.basename(filename))[0]
+        return os.path.join(os.path.dirname(filename), "populations", f"{base}.npz")
+
     def initialize_population(self, filename):
-        data = load_data(filename)
-        initial_entry = data[0]
-        self.population.append(initial_entry)
-        # Generate three more entries randomly as the initla population
-        for _ in range(3):
-            random_entry = self.generate_random_state(initial_entry['variables'])
-            self.population.append({
-                'variables': random_entry,
-                'utility_measure': {'value': None}
-            })
+        store = get_store(filename)
+        schema = problem_schema(store)
+        self.codec = schema.codec
+        self.radices = np.asarray(schema.radices, dtype=np.int64)
+        self.numerical = np.array([t == 'Numerical' for t in schema.types], dtype=bool)
+        self.apply_locks(store)
+        self.path = self.population_path(filename)
         self.initialized = True
+        if self.load_population():
+            return
+        # The problem's current state seeds the population, the rest is random
+        self.population = self.random_individuals(self.population_size)
+        self.population[0] = self.current_digits
+        self.fitness = np.full(self.population_size, np.nan)
+        self.generation = 0
+        self.save_population()
+
+    def apply_locks(self, store):
+        # Locks can change between iterations, so they are read from the latest one
+        schema = problem_schema(store)
+        latest = store.iterations[-1]
+        self.locked = np.array(schema.locked_values(latest), dtype=bool)
+        self.current_digits = np.array([self.codec.digit(i, value) for i, value in enumerate(schema.values(latest))], dtype=np.int64)
+        if self.population is not None:
+            # Individuals bred before a value was locked take the locked value
+            self.population = np.where(self.locked, self.current_digits, self.population)
+
+    def random_individuals(self, count):
+        individuals = (self.rng.random((count, len(self.radices))) * self.radices).astype(np.int64)
+        return np.where(self.locked, self.current_digits, individuals)
 
-    def generate_random_state(self, variables_template):
-        return [{'name': var['name'], 'value': random.choice(["True", "False"])} for var in variables_template]
+    def load_population(self):
+        if not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as saved:
+            population, generation = saved['population'], int(saved['generation'])
+        # A population left behind by an older problem with the same name is discarded
+        if population.ndim != 2 or population.shape[1] != len(self.radices) or (population >= self.radices).any():
+            return False
+        self.population = population.astype(np.int64)
+        self.fitness = np.full(len(population), np.nan)
+        self.generation = generation
+        return True
 
-    #as the json file is updated with the utility values, we need to update the population with the new utility values
+    def save_population(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as file:
+            np.savez(file, population=self.population, generation=self.generation)
+
+    def codes(self, individuals):
+        return np.asarray(self.codec.encode_batch(individuals)).tolist()
+
+    #as the history grows, record the new utilities and hand them to the individuals that match
     def update_population_with_new_utilities(self, filename):
-        data = load_data(filename)
-        for entry in self.population:
-            if entry['utility_measure']['value'] is None:
-                for data_entry in data:
-                    if data_entry['variables'] == entry['variables']:
-                        entry['utility_measure']['value'] = data_entry['utility_measure']['value']
-                        break
-    # swap the top and bottom values of the parents to create children
+        data = get_store(filename).iterations
+        # The last iteration may still be waiting for its result, so it is read again on every call
+        for entry in data[self.recorded_count:]:
+            utility = iteration_utility(entry)
+            if isinstance(utility, (int, float)) and not isinstance(utility, bool):
+                self.utilities[self.codec.encode(entry['variables'])] = utility
+        self.recorded_count = max(len(data) - 1, 0)
+        self.fitness = np.array([self.utilities.get(code, np.nan) for code in self.codes(self.population)], dtype=float)
+
+    def tournament(self, fitness, count):
+        contestants = self.rng.integers(len(fitness), size=(count, self.tournament_size))
+        winners = np.argmax(fitness[contestants], axis=1)
+        return contestants[np.arange(count), winners]
+
+    # breed the next generation from the whole population at once
     def breed(self):
-        # Assuming the population is sorted before this function is called
-        parent1 = self.parents[0]['variables']
-        parent2 = self.parents[1]['variables']
-        child1, child2 = self.crossover(parent1, parent2)
-        self.mutate(child1)
-        self.mutate(child2)
-        self.population.extend([
-            {'variables': child1, 'utility_measure': {'value': None}},
-            {'variables': child2, 'utility_measure': {'value': None}}
-        ])
-
-    def crossover(self, parent1, parent2):
-        split_index = len(parent1) // 2
-        # Ensure parents are dictionaries for easier manipulation
-        child1 = {**{var['name']: var['value'] for var in parent1[:split_index]},
-                **{var['name']: var['value'] for var in parent2[split_index:]}}
-        child2 = {**{var['name']: var['value'] for var in parent2[:split_index]},
-                **{var['name']: var['value'] for var in parent1[split_index:]}}
-        return child1, child2
-
-    # intruduce a mutation in the child
-    def mutate(self, child):
-        # Child is a dictionary
-        mutation_variable = random.choice(list(child.keys()))
-        child[mutation_variable] = not child[mutation_variable]  # Assuming boolean flip
+        # States whose result could not be read never win a tournament
+        fitness = np.where(np.isnan(self.fitness), -np.inf, self.fitness)
+        elite = np.argsort(-fitness, kind='stable')[:min(self.elite_count, len(fitness))]
+        count = len(fitness) - len(elite)
+        children = self.crossover(self.population[self.tournament(fitness, count)], self.population[self.tournament(fitness, count)])
+        self.mutate(children)
+        self.population = np.concatenate([self.population[elite], children])
+        self.fitness = np.concatenate([self.fitness[elite], np.full(count, np.nan)])
+        self.generation += 1
+
+    def crossover(self, parents1, parents2):
+        # Uniform crossover; pairs that skip it copy their first parent
+        take_second = self.rng.random(parents1.shape) < 0.5
+        take_second &= (self.rng.random(len(parents1)) < self.crossover_rate)[:, None]
+        return np.where(take_second, parents2, parents1)
+
+    # intruduce mutations in the children
+    def mutate(self, children):
+        rate = self.mutation_rate if self.mutation_rate is not None else 1 / max(children.shape[1], 1)
+        mask = (self.rng.random(children.shape) < rate) & ~self.locked & (self.radices > 1)
+        # Numerical values step up or down by one, turning back at the ends of their range
+        steps = np.where(self.rng.random(children.shape) < 0.5, -1, 1)
+        stepped = children + steps
+        stepped = np.where((stepped < 0) | (stepped >= self.radices), children - steps, stepped)
+        # Boolean and Categorical values move to any other value
+        shifts = (self.rng.random(children.shape) * (self.radices - 1)).astype(np.int64) + 1
+        jumped = (children + shifts) % np.maximum(self.radices, 1)
+        children[:] = np.where(mask, np.where(self.numerical, stepped, jumped), children)
+
+    def unevaluated(self, tested_states):
+        # Individuals still waiting for a result, each state once
+        seen = set()
+        for code, fitness in zip(self.codes(self.population), self.fitness.tolist()):
+            if np.isnan(fitness) and code not in seen and code not in tested_states:
+                seen.add(code)
+                yield code
 
     def next_parameters(self, filename):
+        batch = self.next_batch(filename, 1)
+        if batch:
+            return batch[0]
+        # Every recent child has been tested already; try a random untested state that keeps the locks instead
+        store = get_store(filename)
+        code = tested_state_index(store).untested(problem_schema(store).locked_digits(store.iterations[-1]), rng=self.random)
+        return EXPLORED_MESSAGE if code is None else self.codec.decode(code)
+
+    def next_batch(self, filename, k):
+        """ Return up to k distinct unevaluated individuals of the current generation, breeding new ones when it is done """
+        store = get_store(filename)
         if not self.initialized:
             self.initialize_population(filename)
-        else:
+        self.apply_locks(store)
+        tested_states = tested_state_index(store)
+        generation = self.generation
+        batch = []
+        for _ in range(self.max_breeding_rounds):
+            self.report_progress(f"Breeding generation {self.generation}")
+            # Individuals that were already tested pick up their recorded utility here
             self.update_population_with_new_utilities(filename)
-
-        # Find the first entry without a set utility value
-        for entry in self.population:
-            if entry['utility_measure']['value'] is None:
-                # Ensure that entry['variables'] is a dictionary
-                return {var['name']: var['value'] for var in entry['variables']}
-
-        # If all have utility values, breed the top two and continue
-        self.population.sort(key=lambda x: x['utility_measure']['value'], reverse=True)
-        self.parents = self.population[:2]
-        self.breed()
-        return self.next_parameters(filename)  # Recursively get the next parameters with new generation
-
+            for code in self.unevaluated(tested_states):
+                batch.append(code)
+                if len(batch) >= k:
+                    break
+            if batch:
+                break
+            self.breed()
+        if self.generation != generation:
+            self.save_population()
+        return [self.codec.decode(code) for code in batch]
@@ -1,186 +1,199 @@
+import heapq
 import random
-import json
 import os
+from app.algorithms.impact_estimator import ImpactEstimator
 from app.algorithms.optimization_algorithm import OptimizationAlgorithm
+from app.utils.iterations import EXPLORED_MESSAGE
+from app.utils.problem_schema import problem_schema
+from app.utils.problem_store import get_store
+from app.utils.state_index import best_state_index, tested_state_index
 
 class HillClimbingOptimization(OptimizationAlgorithm):
-
-    def initialize_impacts(self, impacts_filepath, variables):
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(impacts_filepath), exist_ok=True)
-        
-        impacts = {
-            "impact_scores": {var['name']: {"score": "NA", "iteration_count": 1} for var in variables},
-            "impact_testing_state": True
-        }
-        with open(impacts_filepath, 'w') as f:
-            json.dump(impacts, f)
-
-    def load_impacts(self, impacts_filepath):
-        if os.path.exists(impacts_filepath):
-            with open(impacts_filepath, 'r') as f:
-                return json.load(f)
-        return None
-
-    def save_impacts(self, impacts_filepath, impacts):
-        with open(impacts_filepath, 'w') as f:
-            json.dump(impacts, f)
-
-    def variable_impact_testing_state(self, initial_state, impacts, data, impacts_filepath):
-        for var in initial_state['variables']:
-            if impacts["impact_scores"][var['name']]["score"] == "NA":
-                new_params = {v['name']: v['current_value'] for v in initial_state['variables']}
-                if var['type'] == 'Boolean':
-                    new_params[var['name']] = not var['current_value']
-                elif var['type'] == 'Categorical':
-                    new_params[var['name']] = random.choice([val for val in var['possible_values'] if val != var['current_value']])
-                elif var['type'] == 'Numerical':
-                    current_value = int(var['current_value'])
-                    possible_values = var['possible_values']
-                    if current_value == possible_values[0]:
-                        new_params[var['name']] = current_value + 1
-                    elif current_value == possible_values[-1]:
-                        new_params[var['name']] = current_value - 1
-                    else:
-                        new_params[var['name']] = random.choice([current_value - 1, current_value + 1])
-                # Ensure the new_params state has not been tested
-                if not self.state_already_tested(new_params, data):
-                    return new_params
-        impacts['impact_testing_state'] = False
-        self.save_impacts(impacts_filepath, impacts)
+    # Number of best states whose neighbourhoods feed a batch of suggestions
+    batch_parents = 5
+
+    def __init__(self):
+        # ImpactEstimator of the current problem, read from disk on the first suggestion only
+        self.impacts = None
+
+    def load_impacts(self, filename, problem_title, variables, fresh=False):
+        impacts_filepath = self.impacts_filepath(filename, problem_title)
+        names = [var['name'] for var in variables]
+        if fresh:
+            self.impacts = ImpactEstimator(impacts_filepath, names)
+        elif self.impacts is None or self.impacts.path != impacts_filepath:
+            self.impacts = ImpactEstimator.load(impacts_filepath, names)
+        return self.impacts
+
+    def variable_impact_testing_state(self, initial_state, impacts, tested_states, schema):
+        codec = schema.codec
+        initial_code = codec.encode(initial_state['variables'])
+        for name in impacts.unmeasured():
+            # Flip a Boolean, pick another category or step a number by one within its range
+            neighbours = list(codec.neighbours(initial_code, schema.index[name]))
+            if not neighbours:
+                continue
+            new_code = random.choice(neighbours)
+            # Ensure the new state has not been tested
+            if not self.state_already_tested(new_code, tested_states):
+                return codec.decode(new_code)
+        impacts.stop_testing()
         return None
 
     def next_parameters(self, filename, problem_title):
-        with open(filename, 'r') as file:
-            data = json.load(file)
+        self.report_progress("Loading history")
+        store = get_store(filename)
+        data = store.iterations
+        tested_states = tested_state_index(store)
         
         variables = data[-1]['variables']
 
-        impacts_filename = f"problems/impacts/{problem_title}_impacts.json"
-        current_path = os.getcwd()
-        impacts_filepath = os.path.join(current_path, impacts_filename)
-
-        if len(data) == 1:
-            self.initialize_impacts(impacts_filepath, variables)
-        
-        impacts = self.load_impacts(impacts_filepath)
-
-        if len(data) > 1:
-            self.update_impacts(data, impacts, impacts_filepath)
-            impacts = self.load_impacts(impacts_filepath)
+        # A problem with a single iteration starts over, even if an older one left impacts behind
+        impacts = self.load_impacts(filename, problem_title, variables, fresh=len(data) == 1)
+        try:
+            self.report_progress("Updating impact scores")
+            impacts.update(data)
+            new_params = self.next_state(store, variables, impacts, tested_states)
+        except Exception:
+            # A cancelled or failed suggestion leaves no trace, so its steps are observed again by the next one
+            self.impacts = None
+            raise
+        # Impacts are written at most once per suggestion, and only once it has been made
+        impacts.save()
+        return new_params
 
-        if impacts['impact_testing_state']:
-            print("IMPACT TESTING STATE")
-            potential_next_params = self.variable_impact_testing_state(data[0], impacts, data, impacts_filepath)
+    def next_state(self, store, variables, impacts, tested_states):
+        data = store.iterations
+        schema = problem_schema(store)
+        if impacts.testing:
+            self.report_progress("Testing variable impacts")
+            potential_next_params = self.variable_impact_testing_state(data[0], impacts, tested_states, schema)
             if potential_next_params is not None:
                 return potential_next_params
-        
-        print("OUT OF IMPACT TESTING STATE")
-        
-        potential_next_params = self.hill_climbing_step(data, variables, impacts)
+
+        self.report_progress("Climbing from the best state")
+        best_state = best_state_index(store).best
+        potential_next_params = self.hill_climbing_step(data, variables, impacts, tested_states, best_state, schema)
 
         if potential_next_params is not None:
             return potential_next_params
-        
-        for state in data:
-            state['fully_explored'] = True
-        self.update_json(filename, data)
-
-        # If all states are explored, return a message indicating this
-        if all(state['fully_explored'] for state in data):
-            print("All possible states explored.")
-            return "All possible states explored."
-
-        new_params = self.generate_random_state(variables)
-
-        attempts = 0
-        max_attempts = 100  # To prevent infinite loop
-        while self.state_already_tested(new_params, data):
-            new_params = self.generate_random_state(variables)
-            attempts += 1
-            if attempts >= max_attempts:
-                print("All possible states explored.")
-                return "All possible states explored."
-        return new_params
 
-    def update_impacts(self, data, impacts, impacts_filepath):
-        last_state = data[-1]
-        previous_state = data[-2]
-        change_in_utility = abs(last_state['optimized_variable']['value'] - previous_state['optimized_variable']['value'])
-
-        for var in last_state['variables']:
-            if var['current_value'] != [v for v in previous_state['variables'] if v['name'] == var['name']][0]['current_value']:
-                var_name = var['name']
-                iteration_count = impacts["impact_scores"][var_name]["iteration_count"]
-                current_score = impacts["impact_scores"][var_name]["score"]
-                if current_score == "NA":
-                    new_score = change_in_utility
-                else:
-                    new_score = ((current_score * (iteration_count - 1)) + change_in_utility) / iteration_count
-                impacts["impact_scores"][var_name]["score"] = new_score
-                impacts["impact_scores"][var_name]["iteration_count"] += 1
-                self.save_impacts(impacts_filepath, impacts)
+        # No untested neighbour is left around the best state, which may be a local optimum; the caller
+        # records the fully_explored flag on the current iteration in the same commit as the result
+        return EXPLORED_MESSAGE
+
+    def suggest(self, filename, problem_title):
+        return self.next_parameters(filename, problem_title)
+
+    def next_batch(self, filename, k):
+        """
+        Return up to k distinct untested states to evaluate in parallel.
+
+        The first one is the regular next_parameters suggestion. The others are
+        single-variable moves away from the best states, taken round-robin over
+        the variables in impact order so the batch spreads over different
+        variables, topped up with random untested states. All of them keep the
+        locked values.
+        """
+        store = get_store(filename)
+        first = self.next_parameters(filename, store.iterations[-1]['title'])
+        if first == EXPLORED_MESSAGE:
+            return []
+        tested_states = tested_state_index(store)
+        schema = problem_schema(store)
+        codec = schema.codec
+        impacts = self.impacts
+        locked = schema.locked_digits(store.iterations[-1])
+
+        batch = [codec.encode(first)]
+        chosen = set(batch)
+        for code in self.batch_candidates(store.iterations, impacts, schema):
+            if len(batch) >= k:
                 break
-
-    def hill_climbing_step(self, data, variables, impacts):
-        best_state = max([state for state in data if not state['fully_explored']], key=lambda x: x['optimized_variable']['value'], default=None)
-        
+            # The best states may predate a lock, so their neighbours can move a locked variable
+            if any(codec.digit_at(code, i) != digit for i, digit in locked.items()):
+                continue
+            if code not in chosen and not self.state_already_tested(code, tested_states):
+                chosen.add(code)
+                batch.append(code)
+
+        while len(batch) < k:
+            code = tested_states.untested(locked, exclude=chosen)
+            if code is None:
+                break
+            chosen.add(code)
+            batch.append(code)
+        return [codec.decode(code) for code in batch]
+
+    def batch_candidates(self, data, impacts, schema):
+        parents = heapq.nlargest(self.batch_parents, (state for state in data if not state['fully_explored']), key=lambda x: x['optimized_variable']['value'])
+        codec = schema.codec
+        order = [schema.index[var] for var in impacts.order()]
+        for parent in parents:
+            parent_code = codec.encode(parent['variables'])
+            moves = [list(codec.neighbours(parent_code, i)) for i in order]
+            while any(moves):
+                for variable_moves in moves:
+                    if variable_moves:
+                        yield variable_moves.pop(random.randrange(len(variable_moves)))
+
+    def impacts_filepath(self, filename, problem_title):
+        # Kept next to the problem file, like the side files of the other algorithms
+        impacts_filename = f"impacts/{problem_title}_impacts.json"
+        return os.path.abspath(os.path.join(os.path.dirname(filename), impacts_filename))
+
+    def hill_climbing_step(self, data, variables, impacts, tested_states, best_state, schema):
+        codec = schema.codec
         if best_state is None:
-            new_params = self.generate_random_state(variables)
-            while self.state_already_tested(new_params, data):
-                new_params = self.generate_random_state(variables)
-            return new_params
-
-        for var in sorted(impacts["impact_scores"], key=lambda x: impacts["impact_scores"][x]["score"], reverse=True):
-            potential_values = []
-            for value in [v for v in variables if v['name'] == var][0]['possible_values']:
-                if value != [v for v in variables if v['name'] == var][0]['current_value']:
-                    new_params = self.generate_new_state(best_state['variables'], var, value)
-                    if not self.state_already_tested(new_params, data):
-                        potential_values.append(value)
-
-            if len(potential_values) == 1:
-                return self.generate_new_state(best_state['variables'], var, potential_values[0])
-            elif len(potential_values) > 1:
-                last_utility_change = data[-1]['optimized_variable']['value'] - data[-2]['optimized_variable']['value']
-                if [v for v in variables if v['name'] == var][0]['type'] == 'Categorical':
-                    return self.generate_new_state(best_state['variables'], var, random.choice(potential_values))
-                elif [v for v in variables if v['name'] == var][0]['type'] == 'Numerical':
-                    current_value = int([v for v in best_state['variables'] if v['name'] == var][0]['current_value'])
-                    possible_values = [int(v) for v in [v for v in variables if v['name'] == var][0]['possible_values']]
-                    previous_value = int([v for v in data[-2]['variables'] if v['name'] == var][0]['current_value'])
-                    direction = 1 if last_utility_change > 0 else -1
-                    current_index = possible_values.index(current_value)
-                    new_index = current_index + direction
-                    if new_index < 0:
-                        new_index = 0
-                    elif new_index >= len(possible_values):
-                        new_index = len(possible_values) - 1
-                    return self.generate_new_state(best_state['variables'], var, possible_values[new_index])
-
-    def generate_new_state(self, variables, var_name, new_value):
-        new_state = {var['name']: self.convert_to_correct_type(var['current_value'], var['type']) for var in variables}
-        new_state[var_name] = self.convert_to_correct_type(new_value, [v for v in variables if v['name'] == var_name][0]['type'])
-        return new_state
-
-    def convert_to_correct_type(self, value, var_type):
-        if var_type == 'Boolean':
-            return value == 'True' if isinstance(value, str) else bool(value)
-        elif var_type == 'Numerical':
-            return int(value)
-        elif var_type == 'Categorical':
-            return str(value)
-        return value
-
-    def generate_random_state(self, variables):
-        return {var['name']: self.convert_to_correct_type(random.choice(var['possible_values']), var['type']) for var in variables}
-
-    def state_already_tested(self, new_state, data):
-        for state in data:
-            if all(self.convert_to_correct_type(state['variables'][i]['current_value'], state['variables'][i]['type']) == self.convert_to_correct_type(new_state[state['variables'][i]['name']], state['variables'][i]['type']) for i in range(len(state['variables']))):
-                return True
-        return False
-
-    def update_json(self, filename, data):
-        with open(filename, 'w') as file:
-            json.dump(data, file)
+            # No measured state to climb from yet; once no untested state is left, the caller reports the problem explored
+            impacts.record_move(None)
+            self.report_progress("Searching for an untested state")
+            new_code = tested_states.untested(schema.locked_digits(data[-1]))
+            return codec.decode(new_code) if new_code is not None else None
+
+        new_code, move = self.neighbour_of_best(data, variables, impacts, tested_states, best_state, schema)
+        impacts.record_move(move)
+        return codec.decode(new_code) if new_code is not None else None
+
+    def neighbour_of_best(self, data, variables, impacts, tested_states, best_state, schema):
+        """ The code of an untested state one digit away from the best state, with the Numerical move it makes, if any """
+        codec = schema.codec
+        best_code = codec.encode(best_state['variables'])
+        last_move = impacts.last_move
+        if last_move is not None and (last_move['variable'] not in schema.index or
+                                      codec.digit_at(codec.encode(variables), schema.index[last_move['variable']]) != last_move['digit']):
+            # The state evaluated last is not the one that move suggested
+            last_move = None
+        ordered_variables = impacts.order()
+        for position, var in enumerate(ordered_variables):
+            self.report_progress(f"Exploring {var}", position / len(ordered_variables))
+            i = schema.index[var]
+            if schema.types[i] == 'Numerical':
+                # Keep moving a variable the way its last move went if that improved the utility, else turn around;
+                # only the two neighbouring values of the best one are looked at, however wide the range
+                direction = -1
+                if last_move is not None and last_move['variable'] == var:
+                    improved = data[-1]['optimized_variable']['value'] > last_move['utility']
+                    direction = last_move['direction'] if improved else -last_move['direction']
+                best_digit = codec.digit_at(best_code, i)
+                for digit in (best_digit + direction, best_digit - direction):
+                    if 0 <= digit < schema.radices[i]:
+                        new_code = codec.with_digit(best_code, i, digit)
+                        if not self.state_already_tested(new_code, tested_states):
+                            move = {"variable": var, "direction": digit - best_digit, "digit": digit,
+                                    "utility": best_state['optimized_variable']['value']}
+                            return new_code, move
+                continue
+
+            potential_codes = []
+            for digit in range(schema.radices[i]):
+                new_code = codec.with_digit(best_code, i, digit)
+                if not self.state_already_tested(new_code, tested_states):
+                    potential_codes.append(new_code)
+            if potential_codes:
+                return random.choice(potential_codes), None
+        return None, None
+
+    def state_already_tested(self, new_state, tested_states):
+        return new_state in tested_states
+
@@ -0,0 +1,124 @@
+import json
+import math
+import os
+from app.utils.domains import variable_value
+from app.utils.problem_store import iteration_utility
+
+
+class ImpactEstimator:
+    """
+    Online estimate of how much each variable moves the utility.
+
+    Every step of the history is an observation of |change in utility| for
+    the variables it changed. A step that changed k variables counts for each
+    of them with weight 1/k, so all of them are credited instead of only the
+    first one found. Means and variances are kept with the weighted form of
+    Welford's algorithm, which is exact and numerically stable however many
+    steps come in. Nothing is written to disk until save(), which callers run
+    once per suggestion.
+    """
+
+    def __init__(self, path, names):
+        self.path = path
+        self.stats = {name: {"weight": 0.0, "mean": 0.0, "m2": 0.0, "observations": 0} for name in names}
+        self.testing = True
+        # Number of iterations whose steps have been observed; None for files saved before it was recorded
+        self.updated_through = 0
+        # The Numerical step hill climbing suggested last: variable, direction, digit moved to and utility moved from
+        self.last_move = None
+        self.dirty = True
+
+    @classmethod
+    def load(cls, path, names):
+        """ Load the estimator saved at path, or start a new one when there is none """
+        estimator = cls(path, names)
+        if not os.path.exists(path):
+            return estimator
+        with open(path, 'r') as f:
+            saved = json.load(f)
+        for name, entry in saved.get("impact_scores", {}).items():
+            if name not in estimator.stats:
+                continue
+            if "weight" in entry:
+                estimator.stats[name] = {key: entry[key] for key in ("weight", "mean", "m2", "observations")}
+            elif entry.get("score", "NA") != "NA":
+                # Older files only kept a running average over iteration_count - 1 steps
+                count = max(entry.get("iteration_count", 1) - 1, 1)
+                estimator.stats[name] = {"weight": float(count), "mean": entry["score"], "m2": 0.0, "observations": count}
+        estimator.testing = saved.get("impact_testing_state", True)
+        # Older files were updated on every call, so only the latest step is still new to them
+        estimator.updated_through = saved.get("updated_through")
+        estimator.last_move = saved.get("last_move")
+        estimator.dirty = False
+        return estimator
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        impact_scores = {}
+        for name, stat in self.stats.items():
+            score = self.score(name)
+            impact_scores[name] = dict(stat, score="NA" if score is None else score, iteration_count=stat["observations"] + 1)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({"impact_scores": impact_scores, "impact_testing_state": self.testing, "updated_through": self.updated_through,
+                       "last_move": self.last_move}, f)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+    def observe(self, name, value, weight=1.0):
+        stat = self.stats[name]
+        stat["weight"] += weight
+        delta = value - stat["mean"]
+        stat["mean"] += delta * weight / stat["weight"]
+        stat["m2"] += weight * delta * (value - stat["mean"])
+        stat["observations"] += 1
+        self.dirty = True
+
+    def record_move(self, move):
+        if move != self.last_move:
+            self.last_move = move
+            self.dirty = True
+
+    def stop_testing(self):
+        self.testing = False
+        self.dirty = True
+
+    def update(self, iterations):
+        """ Observe every step of the history that was not observed yet """
+        if self.updated_through is None or self.updated_through > len(iterations):
+            self.updated_through = max(len(iterations) - 1, 1)
+        for i in range(max(self.updated_through, 1), len(iterations)):
+            self.observe_step(iterations[i - 1], iterations[i])
+        if self.updated_through != len(iterations):
+            self.updated_through = len(iterations)
+            self.dirty = True
+
+    def observe_step(self, previous, current):
+        before, after = iteration_utility(previous), iteration_utility(current)
+        if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in (before, after)):
+            return
+        previous_values = {var['name']: variable_value(var) for var in previous['variables']}
+        changed = [var['name'] for var in current['variables'] if var['name'] in self.stats and variable_value(var) != previous_values.get(var['name'])]
+        for name in changed:
+            self.observe(name, abs(after - before), 1 / len(changed))
+
+    def score(self, name):
+        """ Mean utility change caused by the variable, or None until it has been observed """
+        stat = self.stats[name]
+        return stat["mean"] if stat["weight"] > 0 else None
+
+    def confidence(self, name):
+        """ Standard error of the score; infinite until there are two observations """
+        stat = self.stats[name]
+        if stat["observations"] < 2:
+            return math.inf
+        return math.sqrt(stat["m2"] / stat["weight"] / stat["weight"])
+
+    def unmeasured(self):
+        return [name for name in self.stats if self.score(name) is None]
+
+    def order(self):
+        # Measured impacts first, largest first and the least certain first among equals; variables not observed yet go last
+        return sorted(self.stats, key=lambda name: (self.score(name) is not None, self.score(name) or 0, self.confidence(name)), reverse=True)
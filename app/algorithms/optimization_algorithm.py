@@ -1,4 +1,27 @@
+class OptimizationCancelled(Exception):
+    """ Raised from inside next_parameters when the caller asked the computation to stop """
+
+
 class OptimizationAlgorithm:
+    # Optional hooks set by callers running the algorithm in the background
+    progress_callback = None
+    cancel_requested = None
+
     def next_parameters(self, filename):
         """ This should be implemented to read the JSON file and compute the next set of parameters """
         raise NotImplementedError("This method should be overridden by subclasses")
+
+    def suggest(self, filename, problem_title):
+        """ Entry point used by OptimizationSession; algorithms that need the problem title override it """
+        return self.next_parameters(filename)
+
+    def next_batch(self, filename, k):
+        """ Return up to k distinct, untested states so several evaluations can run in parallel """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def report_progress(self, message, fraction=None):
+        """ Report how far the computation got and stop it if cancellation was requested """
+        if self.cancel_requested is not None and self.cancel_requested():
+            raise OptimizationCancelled(message)
+        if self.progress_callback is not None:
+            self.progress_callback(message, fraction)
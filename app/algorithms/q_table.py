@@ -0,0 +1,114 @@
+import os
+import struct
+
+
+class SparseQTable:
+    """
+    Q-values for the (state, action) pairs that have actually been visited.
+
+    States are packed integer codes and actions index a factored action set
+    (for example "flip variable i"), so memory grows with the number of visits
+    instead of with 2**n. The checkpoint is an append-only binary log with one
+    fixed-size record per update, replayed on load and compacted once it has
+    grown well past the number of live entries.
+    """
+
+    MAGIC = b'LOQT\x01'
+    # learned_through, action, value, length of the packed state that follows
+    RECORD = struct.Struct('<QIdH')
+
+    def __init__(self, path=None):
+        self.path = path
+        self.rows = {}
+        self.learned_through = 0
+        self._pending = []
+        self._records = 0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def get(self, state, action):
+        return self.rows.get(state, {}).get(action, 0.0)
+
+    def set(self, state, action, value):
+        self.rows.setdefault(state, {})[action] = value
+        self._pending.append((state, action, value))
+
+    def max_value(self, state, num_actions):
+        row = self.rows.get(state)
+        if not row:
+            return 0.0
+        best = max(row.values())
+        # Actions that were never taken still hold their initial value of zero
+        return best if len(row) >= num_actions else max(best, 0.0)
+
+    def best_actions(self, state, num_actions):
+        row = self.rows.get(state, {})
+        best = self.max_value(state, num_actions)
+        return [action for action in range(num_actions) if row.get(action, 0.0) == best]
+
+    def reset(self):
+        self.rows = {}
+        self.learned_through = 0
+        self._pending = []
+        self._records = 0
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def load(self):
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        if not content.startswith(self.MAGIC):
+            raise ValueError(f"{self.path} is not a Q-table checkpoint")
+        position = len(self.MAGIC)
+        while position + self.RECORD.size <= len(content):
+            learned_through, action, value, state_length = self.RECORD.unpack_from(content, position)
+            position += self.RECORD.size
+            if position + state_length > len(content):
+                break
+            state = int.from_bytes(content[position:position + state_length], 'little')
+            position += state_length
+            self.rows.setdefault(state, {})[action] = value
+            self.learned_through = learned_through
+            self._records += 1
+        if self._records > 2 * self.entry_count() + 1024:
+            self.compact()
+
+    def entry_count(self):
+        return sum(len(row) for row in self.rows.values())
+
+    def flush(self):
+        """ Append the updates made since the last flush to the checkpoint """
+        if self.path is None:
+            self._pending = []
+            return
+        new_file = not os.path.exists(self.path)
+        if not self._pending and not new_file:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        payload = b''.join(self._encode(state, action, value) for state, action, value in self._pending)
+        with open(self.path, 'ab') as file:
+            if new_file:
+                file.write(self.MAGIC)
+            file.write(payload)
+        self._records += len(self._pending)
+        self._pending = []
+
+    def compact(self):
+        payload = b''.join(
+            self._encode(state, action, value)
+            for state, row in self.rows.items()
+            for action, value in row.items()
+        )
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(self.MAGIC)
+            file.write(payload)
+        os.replace(temp_path, self.path)
+        self._records = self.entry_count()
+        self._pending = []
+
+    def _encode(self, state, action, value):
+        packed_state = state.to_bytes((state.bit_length() + 7) // 8, 'little')
+        return self.RECORD.pack(self.learned_through, action, value, len(packed_state)) + packed_state
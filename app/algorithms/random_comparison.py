@@ -1,8 +1,12 @@
+import logging
 import random
-import os
-import json
-print(os.getcwd())
 from app.algorithms.optimization_algorithm import OptimizationAlgorithm
+from app.utils.problem_store import get_store
+from app.utils.problem_schema import problem_schema
+from app.utils.state_index import tested_state_index
+
+logger = logging.getLogger(__name__)
+
 class RandomComparison(OptimizationAlgorithm):
     """
     Simulates a random choice of parameters for testing purposes.
@@ -10,8 +14,9 @@ class RandomComparison(OptimizationAlgorithm):
 
     def next_parameters(self, filename):
         
-        with open(filename, 'r') as file:
-            data = json.load(file)
+        store = get_store(filename)
+        data = store.iterations
+        schema = problem_schema(store)
 
         # Here is where we would implement an algorithm to determine the next set of parameters
         
@@ -19,13 +24,34 @@ class RandomComparison(OptimizationAlgorithm):
         new_params = {}
         try:
             variables = data[-1]['variables']  # Assuming data is sorted and last entry is latest
-            for var in variables:
+            for var, domain in zip(variables, schema.domains):
                 if var["lock_value"]:
                     # If lock_value is True, keep the current value
                     new_params[var['name']] = var['current_value']
                 else:
-                    new_params[var['name']] = random.choice(var['possible_values'])
+                    new_params[var['name']] = random.choice(domain)
         except (IndexError, KeyError) as e:
-            print(f"Error accessing variables from JSON data: {e}")
+            logger.warning("Error accessing variables from JSON data: %s", e)
         
-        return new_params
\ No newline at end of file
+        return new_params
+
+    def next_batch(self, filename, k):
+        # Unlike next_parameters, a batch skips tested states and never repeats itself
+        store = get_store(filename)
+        tested_states = tested_state_index(store)
+        schema = problem_schema(store)
+        codec = schema.codec
+        locked = schema.locked_digits(store.iterations[-1]).items()
+
+        batch = []
+        chosen = set()
+        attempts = 0
+        while len(batch) < k and attempts < 100 * k:
+            attempts += 1
+            code = random.randrange(codec.size)
+            for i, digit in locked:
+                code = codec.with_digit(code, i, digit)
+            if code not in chosen and code not in tested_states:
+                chosen.add(code)
+                batch.append(code)
+        return [codec.decode(code) for code in batch]
@@ -1,85 +1,126 @@
+import os
 import random
-from algorithms.optimization_algorithm import OptimizationAlgorithm
-import json
-import numpy as np
+from app.algorithms.optimization_algorithm import OptimizationAlgorithm
+from app.algorithms.q_table import SparseQTable
+from app.utils.iterations import EXPLORED_MESSAGE
+from app.utils.problem_store import get_store, iteration_utility
+from app.utils.state_index import tested_state_index
+from app.utils.problem_schema import problem_schema
 
 class ReinforcementLearning(OptimizationAlgorithm):
     """
-    Simulates the hill climbing algorithm.
-    Currently, it returns a random state for testing purposes.
+    Tabular Q-learning over the Boolean variables of a problem.
 
-    :param variables: a list of variable names
+    States are StateCodec codes and an action flips a single unlocked Boolean
+    variable, so there are n actions instead of 2**n - 1.
+    Q-values live in a SparseQTable checkpointed next to the problem file;
+    each call learns from the iterations recorded since the previous one and
+    appends only those updates to the checkpoint.
     """
-    #Defining the different parameters
-    
-    
-    #Initializing the Q-matrix
+    epsilon = 0.9
+    alpha = 0.85
+    gamma = 0.95
+
+    def __init__(self):
+        # The Q-table is read from its checkpoint once and kept in memory between suggestions
+        self.table = None
+
+    def checkpoint_path(self, filename):
+        base = os.path.splitext(os.path.basename(filename))[0]
+        return os.path.join(os.path.dirname(filename), "q_tables", f"{base}.qtable")
+
     def next_parameters(self, filename):
-        epsilon = 0.9
-        alpha = 0.85
-        gamma = 0.95
-        with open(filename, 'r') as file:
-            data = json.load(file)
-        length = 2**len(data[-1]['variables'])
-        variables = data[-1]['variables']
-        if data[-1]['iteration_count'] == 1:
-            Q = np.zeros((length, length-1))
-            state = 0
-            num = 0
-             # Assuming data is sorted and last entry is latest
-            for var in variables:
-                if var['value'] == "True":
-                    state += 2**num
-                num += 1  
+        codec, state, actions, table = self.learn_history(filename)
+        store = get_store(filename)
+        tested_states = tested_state_index(store)
+        # Flips back to a tested state would make the agent toggle the same variables forever
+        allowed = [action for action in range(len(actions)) if self.flip(codec, state, actions[action]) not in tested_states]
+        if not allowed:
+            # With nothing left to flip, the current state (already tested) would be suggested again
+            return self.untested_state(store)
+        if random.uniform(0, 1) < self.epsilon:
+            action = random.choice(allowed)
+        else:
+            best = max(table.get(state, action) for action in allowed)
+            action = random.choice([action for action in allowed if table.get(state, action) == best])
+        return codec.decode(self.flip(codec, state, actions[action]))
+
+    def flip(self, codec, state, index):
+        return codec.with_digit(state, index, 1 - codec.digit_at(state, index))
+
+    def next_batch(self, filename, k):
+        """
+        Return up to k distinct untested states, each one flip away from the
+        current state, ranked by Q-value (or shuffled while exploring) and
+        topped up with random untested states that keep the locked values.
+        """
+        codec, state, actions, table = self.learn_history(filename)
+        store = get_store(filename)
+        tested_states = tested_state_index(store)
+        ranked = list(range(len(actions)))
+        if random.uniform(0, 1) < self.epsilon:
+            random.shuffle(ranked)
         else:
-            with open('Reinforcement.json', 'r') as file:
-                table = json.load(file)
-            Q = np.array(table['Q'])
-            num = 0
-            state = 0
-            pvariables = data[len(data)-1]['variables']
-            for var in pvariables:
-                if var['value'] == "True":
-                    state += 2**num
-                num += 1
-            next_state = 0
-            old_value = Q[state, table['action']]
-            num = 0
-            for var in variables:
-                if var['value'] == "True":
-                    next_state += 2**num
-                num += 1
-            
-            next_max = np.max(Q[next_state])
-            if isinstance(data[-1]['utility_measure']['value'], int):
-                new_value = (1-alpha)*old_value + alpha*(int(data[-1]['utility_measure']['value']) + gamma*next_max)
-                Q[state, table['action']] = new_value
-            state = next_state
-        
-        # print(data)
-        # print()
+            ranked.sort(key=lambda action: table.get(state, action), reverse=True)
+
+        batch = []
+        for action in ranked:
+            if len(batch) >= k:
+                break
+            code = self.flip(codec, state, actions[action])
+            if code not in tested_states:
+                batch.append(code)
+
+        locked = problem_schema(store).locked_digits(store.iterations[-1])
+        chosen = set(batch)
+        while len(batch) < k:
+            code = tested_states.untested(locked, exclude=chosen)
+            if code is None:
+                break
+            chosen.add(code)
+            batch.append(code)
+        return [codec.decode(code) for code in batch]
+
+    def untested_state(self, store):
+        """ A random untested state that keeps the locked values, or the explored message once there is none """
+        schema = problem_schema(store)
+        code = tested_state_index(store).untested(schema.locked_digits(store.iterations[-1]))
+        return EXPLORED_MESSAGE if code is None else schema.codec.decode(code)
+
+    def learn_history(self, filename):
+        # Learns from the iterations recorded since the last call; a recorded batch counts as a chain of steps.
+        # A step is only learned once an iteration follows it: until then the result of the last iteration may
+        # not be committed yet. Learning it would not change the choice made from the last state anyway.
+        store = get_store(filename)
+        data = store.iterations
+        schema = problem_schema(store)
+        codec = schema.codec
+        locked = schema.locked_values(data[-1])
+        actions = [i for i in schema.positions_of_type('Boolean') if not locked[i]]
+
+        path = self.checkpoint_path(filename)
+        if self.table is None or self.table.path != path:
+            self.table = SparseQTable(path)
+        table = self.table
+        if table.learned_through > len(data):
+            # The checkpoint belongs to an older problem with the same name
+            table.reset()
+        for i in range(max(table.learned_through, 1), len(data) - 1):
+            self.learn(table, codec, data[i - 1], data[i], actions)
+        # Checkpoints written before this rule may already count the last iteration
+        table.learned_through = max(table.learned_through, len(data) - 1)
+        table.flush()
+        return codec, codec.encode(data[-1]['variables']), actions, table
 
-        # Assuming each variable block contains a 'name' and expecting it to be boolean
-        new_params = {}
-        try:
-            
-            action=0
-            if np.random.uniform(0, 1) < epsilon:
-                action = random.randint(0, length-2)
-            else:
-                action = np.argmax(Q[state, :])
-            baction = bin(action+1)
-            for var in variables:
-                if(len(baction) > 1 and baction[len(baction)-1] == '1'):
-                    new_params[var['name']] = "True" if var['value'] == "False" else "False"
-                else:
-                    new_params[var['name']] = "True" if var['value'] == "True" else "False"
-                baction = baction[:-1]
-            rldata = {"Q": Q.tolist(),
-                      "action": int(action)}
-            with open('Reinforcement.json', 'w') as f:
-                json.dump(rldata, f)  
-        except (IndexError, KeyError) as e:
-            print(f"Error accessing variables from JSON data: {e}")
-        
-        return new_params
\ No newline at end of file
+    def learn(self, table, codec, previous, current, actions):
+        reward = iteration_utility(current)
+        if not isinstance(reward, (int, float)) or isinstance(reward, bool):
+            return
+        state = codec.encode(previous['variables'])
+        next_state = codec.encode(current['variables'])
+        next_max = table.max_value(next_state, len(actions))
+        # A step that changed several variables at once is credited to each of them
+        for action, index in enumerate(actions):
+            if codec.digit_at(state, index) != codec.digit_at(next_state, index):
+                old_value = table.get(state, action)
+                table.set(state, action, (1 - self.alpha) * old_value + self.alpha * (reward + self.gamma * next_max))
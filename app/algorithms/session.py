@@ -0,0 +1,59 @@
+import importlib
+from app.utils.iterations import next_iteration
+from app.utils.problem_store import get_store
+from app.utils.profiling import timer
+
+# The choices of the algorithm combo box on the problem definition page. The
+# classes are imported on first use, so that picking one does not load the
+# others (and numpy) into a process that may never need them.
+ALGORITHMS = {
+    "Genetic": "app.algorithms.genetic_algo.GeneticAlgo",
+    "Hill Climbing": "app.algorithms.hill_climbing.HillClimbingOptimization",
+    "Reinforcement Learning": "app.algorithms.reinforcement_learning.ReinforcementLearning",
+    "Surrogate Model": "app.algorithms.surrogate.SurrogateOptimization",
+    "Test Every Combination": "app.algorithms.exhaustive_search.ExhaustiveSearch",
+}
+DEFAULT_ALGORITHM = "Hill Climbing"
+
+
+def algorithm_class(name):
+    """ The class of the named algorithm; hill climbing for unknown or missing names """
+    module, _, class_name = ALGORITHMS.get(name, ALGORITHMS[DEFAULT_ALGORITHM]).rpartition('.')
+    return getattr(importlib.import_module(module), class_name)
+
+
+def algorithm_for(iteration):
+    """ A new instance of the algorithm chosen for a problem; hill climbing when none was chosen """
+    return algorithm_class(iteration.get('algorithm'))()
+
+
+class OptimizationSession:
+    """
+    An optimizer kept alive for one problem between suggestions.
+
+    The problem file is only read when the session starts (or when it changed
+    on disk); afterwards the session shares the cached ProblemStore. Results
+    come in through observe(), which appends them to the log, and suggest()
+    picks up only what was added since the previous call: the store's tested
+    and best state indexes and the algorithm's own state (impact scores,
+    Q-table, population) are all updated incrementally.
+    """
+
+    def __init__(self, filename, problem_title, algorithm=None):
+        self.filename = filename
+        self.problem_title = problem_title
+        self.store = get_store(filename)
+        self.algorithm = algorithm if algorithm is not None else algorithm_for(self.store.iterations[-1])
+
+    @property
+    def iterations(self):
+        return self.store.iterations
+
+    def observe(self, state, value):
+        """ Record that state (a name -> value dict) was evaluated and measured value """
+        self.store.commit(next_iteration(self.store.iterations[-1], state, value))
+
+    def suggest(self):
+        """ Return the next state to evaluate, or the explored message once nothing is left """
+        with timer(f"{type(self.algorithm).__name__}.next_parameters"):
+            return self.algorithm.suggest(self.filename, self.problem_title)
@@ -0,0 +1,173 @@
+import math
+import random
+import numpy as np
+from app.algorithms.optimization_algorithm import OptimizationAlgorithm
+from app.utils.iterations import EXPLORED_MESSAGE
+from app.utils.problem_schema import problem_schema
+from app.utils.problem_store import get_store, iteration_utility
+from app.utils.state_index import tested_state_index
+
+_erf = np.vectorize(math.erf, otypes=[float])
+
+
+class SurrogateOptimization(OptimizationAlgorithm):
+    """
+    Model-based optimizer for problems where every evaluation is expensive.
+
+    A Gaussian process is fitted to the whole history, with Booleans and
+    Numerical values scaled to [0, 1] and Categorical values one-hot encoded.
+    Its length scale and noise are picked from a small grid by marginal
+    likelihood. The next state is the untested candidate with the largest
+    expected improvement over the best result so far; candidates are random
+    states plus the single-variable moves around the best states. Until a
+    few results are in, untested states are drawn at random.
+    """
+    initial_samples = 3
+    candidate_count = 2000
+    local_parents = 5
+    # Exploration margin of expected improvement, in standard deviations of the results
+    xi = 0.01
+    length_scales = (0.1, 0.2, 0.4, 0.8, 1.6)
+    # Fitting is cubic in the number of results, so long histories are fitted on a subset
+    max_training_points = 500
+    noise_levels = (1e-4, 1e-2, 1e-1)
+
+    def __init__(self):
+        # Encoded results of the finished iterations; the last iteration may still change and is read on every call
+        self.codes = []
+        self.targets = []
+        self.recorded_count = 0
+
+    def history(self, store, codec):
+        data = store.iterations
+        for iteration in data[self.recorded_count:len(data) - 1]:
+            self.record(iteration, codec, self.codes, self.targets)
+        self.recorded_count = max(self.recorded_count, len(data) - 1)
+        codes, targets = list(self.codes), list(self.targets)
+        if data:
+            self.record(data[-1], codec, codes, targets)
+        return codes, targets
+
+    def record(self, iteration, codec, codes, targets):
+        utility = iteration_utility(iteration)
+        if isinstance(utility, (int, float)) and not isinstance(utility, bool):
+            codes.append(codec.encode(iteration['variables']))
+            targets.append(float(utility))
+
+    def features(self, schema, codes):
+        digits = np.asarray(schema.codec.decode_batch(codes), dtype=float).reshape(len(codes), len(schema))
+        columns = []
+        for i, (var_type, radix) in enumerate(zip(schema.types, schema.radices)):
+            if var_type == 'Categorical':
+                columns.append(digits[:, i, None] == np.arange(radix))
+            else:
+                columns.append(digits[:, i, None] / max(radix - 1, 1))
+        return np.hstack(columns).astype(float) if columns else np.zeros((len(codes), 0))
+
+    def training_set(self, y):
+        """ Indexes of the results the model is fitted on: all of them, or the best half plus a random sample of the rest """
+        if len(y) <= self.max_training_points:
+            return np.arange(len(y))
+        ranked = np.argsort(y)[::-1]
+        best = ranked[:self.max_training_points // 2]
+        rest = random.sample(ranked[len(best):].tolist(), self.max_training_points - len(best))
+        return np.concatenate([best, np.asarray(rest, dtype=int)])
+
+    def squared_distances(self, A, B):
+        return np.maximum((A ** 2).sum(axis=1)[:, None] + (B ** 2).sum(axis=1)[None, :] - 2 * A @ B.T, 0.0)
+
+    def fit(self, X, y):
+        """ Fit the Gaussian process; returns a function giving the predicted mean and deviation of new rows """
+        best = None
+        dimension = max(X.shape[1], 1)
+        distances = self.squared_distances(X, X)
+        for scale in self.length_scales:
+            length = scale * math.sqrt(dimension)
+            kernel = np.exp(-distances / (2 * length ** 2))
+            for noise in self.noise_levels:
+                try:
+                    factor = np.linalg.cholesky(kernel + noise * np.eye(len(X)))
+                except np.linalg.LinAlgError:
+                    continue
+                alpha = np.linalg.solve(factor.T, np.linalg.solve(factor, y))
+                likelihood = -0.5 * y @ alpha - np.log(np.diag(factor)).sum()
+                if best is None or likelihood > best[0]:
+                    best = (likelihood, length, factor, alpha)
+        _, length, factor, alpha = best
+
+        def predict(rows):
+            cross = np.exp(-self.squared_distances(rows, X) / (2 * length ** 2))
+            mean = cross @ alpha
+            v = np.linalg.solve(factor, cross.T)
+            variance = np.maximum(1.0 - (v ** 2).sum(axis=0), 1e-12)
+            return mean, np.sqrt(variance)
+        return predict
+
+    def expected_improvement(self, mean, deviation, best):
+        improvement = mean - best - self.xi
+        z = improvement / deviation
+        cdf = 0.5 * (1 + _erf(z / math.sqrt(2)))
+        pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+        return improvement * cdf + deviation * pdf
+
+    def candidates(self, schema, tested_states, codes, targets, locked):
+        codec = schema.codec
+        found = set()
+        for _ in range(self.candidate_count):
+            found.add(self.random_code(codec, locked))
+        # Single-variable moves around the best results, where improvements are most likely
+        for index in np.argsort(targets)[::-1][:self.local_parents].tolist():
+            # A result measured before a value was locked is moved to the locked value first
+            parent = codes[index]
+            for i, digit in locked.items():
+                parent = codec.with_digit(parent, i, digit)
+            for i in range(len(schema)):
+                if i not in locked:
+                    found.update(codec.neighbours(parent, i))
+        return [code for code in found if code not in tested_states]
+
+    def random_code(self, codec, locked):
+        # locked maps positions to the digits they are held at
+        code = random.randrange(codec.size)
+        for i, digit in locked.items():
+            code = codec.with_digit(code, i, digit)
+        return code
+
+    def random_untested(self, codec, tested_states, locked):
+        for _ in range(100 * self.candidate_count):
+            code = self.random_code(codec, locked)
+            if code not in tested_states:
+                return codec.decode(code)
+        return EXPLORED_MESSAGE
+
+    def next_parameters(self, filename):
+        store = get_store(filename)
+        schema = problem_schema(store)
+        codec = schema.codec
+        tested_states = tested_state_index(store)
+        codes, targets = self.history(store, codec)
+        locked = schema.locked_digits(store.iterations[-1])
+        if len(tested_states.keys) + 1 >= codec.size:
+            # Everything but possibly one state has been tried; fall back to a plain scan
+            for code in range(codec.size):
+                if code not in tested_states and all(codec.digit_at(code, i) == digit for i, digit in locked.items()):
+                    return codec.decode(code)
+            return EXPLORED_MESSAGE
+        if len(codes) < self.initial_samples:
+            return self.random_untested(codec, tested_states, locked)
+
+        self.report_progress("Fitting the surrogate model")
+        # Minimizing problems are fitted on the negated results
+        sign = -1.0 if store.iterations[-1].get('objective') == "Minimize" else 1.0
+        y = sign * np.asarray(targets)
+        y = (y - y.mean()) / (y.std() or 1.0)
+        training = self.training_set(y)
+        predict = self.fit(self.features(schema, [codes[i] for i in training]), y[training])
+
+        self.report_progress("Scoring candidates")
+        candidates = self.candidates(schema, tested_states, codes, y, locked)
+        if not candidates:
+            return self.random_untested(codec, tested_states, locked)
+        mean, deviation = predict(self.features(schema, candidates))
+        scores = self.expected_improvement(mean, deviation, y.max())
+        return codec.decode(candidates[int(np.argmax(scores))])
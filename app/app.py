@@ -1,27 +1,84 @@
 import sys
 import os
-from PyQt5.QtWidgets import QApplication
+from collections import OrderedDict
+from PyQt5.QtWidgets import QApplication, QMessageBox
 from .problem_definition import ProblemDefinitionPage
-from .iterative_optimization import IterativeOptimizationPage
+from .optimizer_worker import OptimizationRunner
 from .style import apply_dark_theme
+from .utils.problem_store import get_store
+from .utils.iterations import record_suggestion
+from .utils.profiling import profiled
 
 class OptimizationApp:
+    # Problem pages kept alive besides the one on screen
+    cached_problem_pages = 8
+
     def __init__(self):
         self.app = QApplication(sys.argv)
         self.main_window = None
+        # Pages are built once and hidden when the user moves on; navigating refreshes them in place
+        self.problem_definition_page = None
+        self.iteration_pages = OrderedDict()
         apply_dark_theme(self.app)
+        # Suggestions run in the background and outlive the page that requested them
+        self.optimization_runner = OptimizationRunner()
+        self.optimization_runner.finished.connect(self.on_suggestion_ready)
+        self.app.aboutToQuit.connect(self.optimization_runner.cancel_all)
 
-    def start_problem_definition(self):
+    def show_page(self, page):
+        if page is self.main_window:
+            return
         if self.main_window is not None:
-            self.main_window.close()
-        self.main_window = ProblemDefinitionPage(self)
-        self.main_window.show()
+            # The next page takes the place of the current one on screen
+            page.setGeometry(self.main_window.geometry())
+            self.main_window.hide()
+        self.main_window = page
+        page.show()
+
+    @profiled()
+    def start_problem_definition(self):
+        if self.problem_definition_page is None:
+            self.problem_definition_page = ProblemDefinitionPage(self)
+        else:
+            self.problem_definition_page.existing_problems_tab.load_problems()
+        self.show_page(self.problem_definition_page)
 
+    @profiled()
     def start_iterative_optimization(self, problem_title, filename):
-        if self.main_window is not None:
-            self.main_window.close()
-        self.main_window = IterativeOptimizationPage(self, problem_title, filename)
-        self.main_window.show()
+        # Imported on first use; the first window is the problem definition page
+        from .iterative_optimization import IterativeOptimizationPage
+        page = self.iteration_pages.pop(filename, None)
+        if page is None:
+            page = IterativeOptimizationPage(self, problem_title, filename)
+        else:
+            page.refresh()
+        self.iteration_pages[filename] = page
+        self.show_page(page)
+        # Forget the least recently opened problems
+        while len(self.iteration_pages) > self.cached_problem_pages:
+            _, evicted = self.iteration_pages.popitem(last=False)
+            evicted.deleteLater()
+
+    def on_suggestion_ready(self, filename, new_params):
+        from .iterative_optimization import IterativeOptimizationPage
+        store = get_store(filename)
+        title = store.iterations[-1]['title']
+        has_next = record_suggestion(store, new_params)
+
+        page = self.main_window
+        if isinstance(page, IterativeOptimizationPage) and page.filename == filename:
+            if has_next:
+                QMessageBox.information(page, "Data Submitted", "Data has been updated successfully.")
+            else:
+                QMessageBox.information(page, "Optimization Complete", "All possible states have been explored.")
+            self.start_problem_definition()
+            return
+
+        # The user moved on to another page; let them know without interrupting
+        message = f"Next suggestion ready for {title}" if has_next else f"All possible states of {title} have been explored"
+        page.statusBar().showMessage(message, 5000)
+        if isinstance(page, ProblemDefinitionPage):
+            page.existing_problems_tab.load_problems()
 
     def start(self):
         self.start_problem_definition()
@@ -0,0 +1,336 @@
+"""
+Headless command line interface to the problems library.
+
+Drives problems from scripts and scheduled jobs without the GUI: it never
+imports PyQt5, and an algorithm (with numpy) is only imported when a
+suggestion is asked for. The commands follow the GUI's workflow: a problem
+is created with the state to evaluate first, the measured result of the
+pending state is recorded, and only then does a suggestion append the
+next state to evaluate.
+
+    python -m app.cli create "Morning routine" --variable coffee:Boolean --variable sleep:Numerical:6..9 \\
+        --variable music:Categorical:jazz,rock --optimized-variable Focus --algorithm "Hill Climbing"
+    python -m app.cli record "Morning routine" 7.5
+    python -m app.cli suggest "Morning routine"
+    python -m app.cli batch operations.jsonl
+
+Every command prints JSON. batch reads one operation per line (or a JSON
+list) from a file or standard input, e.g.
+
+    {"command": "record", "title": "Morning routine", "value": 7.5}
+    {"command": "suggest", "title": "Morning routine"}
+
+and prints one result per operation; a failed operation is reported and
+the others still run.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+from app.algorithms.session import ALGORITHMS, algorithm_for
+from app.utils.calculations import calculate_number_of_possible_states
+from app.utils.domains import canonical_value, numeric_range, variable_domain
+from app.utils.iterations import EXPLORED_MESSAGE, record_suggestion
+from app.utils.problem_index import get_problem_index, summarize
+from app.utils.problem_store import LEGACY_EXTENSION, PROBLEMS_DIR, ProblemStore, get_store, problem_exists, problem_filename
+
+VARIABLE_TYPES = ("Boolean", "Numerical", "Categorical")
+OBJECTIVES = ("Maximize", "Minimize")
+
+
+class CommandError(Exception):
+    pass
+
+
+def find_problem(title, problems_dir=PROBLEMS_DIR):
+    filename = problem_filename(title, problems_dir)
+    if os.path.exists(filename):
+        return filename
+    legacy = os.path.splitext(filename)[0] + LEGACY_EXTENSION
+    if os.path.exists(legacy):
+        return legacy
+    raise CommandError(f"No problem named '{title}'")
+
+
+def parse_variable(text):
+    """ A variable definition from NAME:Boolean, NAME:Numerical:MIN..MAX[/STEP] or NAME:Categorical:A,B,C """
+    name, _, rest = text.partition(':')
+    var_type, _, values = rest.partition(':')
+    var_type = var_type.capitalize()
+    spec = {"name": name, "type": var_type}
+    if var_type == "Numerical":
+        bounds, _, step = values.partition('/')
+        low, _, high = bounds.partition('..')
+        try:
+            spec.update(min=int(low), max=int(high), step=int(step or 1))
+        except ValueError:
+            raise CommandError(f"Numerical variable '{name}' needs MIN..MAX[/STEP], got '{values}'")
+    elif var_type == "Categorical":
+        spec["values"] = [value for value in values.split(',') if value]
+    return spec
+
+
+def build_variable(spec, order):
+    """ The stored form of a variable, as the problem definition page builds it """
+    name, var_type = spec.get("name", "").strip(), str(spec.get("type", "")).capitalize()
+    if not name:
+        raise CommandError("Every variable needs a name")
+    if var_type not in VARIABLE_TYPES:
+        raise CommandError(f"Variable '{name}' has type '{spec.get('type')}'; expected one of {', '.join(VARIABLE_TYPES)}")
+    if var_type == "Boolean":
+        possible_values, initial_value = [True, False], True
+    elif var_type == "Numerical":
+        if not spec.get("min", 0) < spec.get("max", 0):
+            raise CommandError(f"Numerical variable '{name}' needs min < max")
+        possible_values, initial_value = numeric_range(spec["min"], spec["max"], spec.get("step", 1)), spec["min"]
+    else:
+        possible_values = [str(value) for value in spec.get("values", [])]
+        if not possible_values:
+            raise CommandError(f"Categorical variable '{name}' needs at least one value")
+        initial_value = possible_values[0]
+    return {
+        "name": name,
+        "type": var_type,
+        "possible_values": possible_values,
+        "current_value": initial_value,
+        "order": order,
+        "lock_order": False,
+        "lock_value": False,
+        "impact_score": 0,
+    }
+
+
+def apply_state(iteration, state):
+    """ Set the variables named in state (name -> value, strings accepted) on iteration """
+    variables = {var['name']: var for var in iteration['variables']}
+    for name, value in state.items():
+        if name not in variables:
+            raise CommandError(f"Unknown variable '{name}'")
+        var = variables[name]
+        try:
+            value = canonical_value(value, var['type'])
+        except ValueError:
+            raise CommandError(f"'{value}' is not a value of {var['type']} variable '{name}'")
+        if value not in variable_domain(var):
+            raise CommandError(f"'{value}' is not a possible value of '{name}'")
+        var['current_value'] = value
+
+
+def create_problem(title, variables, optimized_variable, algorithm=None, objective="Maximize", order_matters=False,
+                   vars_per_state=None, description="", state=None, problems_dir=PROBLEMS_DIR):
+    title = title.strip()
+    if not title:
+        raise CommandError("The problem needs a title")
+    if problem_exists(title, problems_dir):
+        raise CommandError(f"A problem named '{title}' already exists")
+    if not variables:
+        raise CommandError("The problem needs at least one variable")
+    if algorithm is not None and algorithm not in ALGORITHMS:
+        raise CommandError(f"Unknown algorithm '{algorithm}'; expected one of {', '.join(ALGORITHMS)}")
+    if objective not in OBJECTIVES:
+        raise CommandError(f"Unknown objective '{objective}'; expected one of {', '.join(OBJECTIVES)}")
+    stored = [build_variable(spec, position + 1 if order_matters else 0) for position, spec in enumerate(variables)]
+    if len({var['name'] for var in stored}) != len(stored):
+        raise CommandError("Variable names must be unique")
+    num_vars = vars_per_state or len(stored)
+    if not 0 < num_vars <= len(stored):
+        raise CommandError(f"Variables per state must be between 1 and {len(stored)}")
+    problem = {
+        "title": title,
+        "description": description,
+        "variables": stored,
+        "optimized_variable": {"name": optimized_variable, "value": 0},
+        "optimization_option": "Automatic Optimization",
+        "algorithm": algorithm or "Hill Climbing",
+        "objective": objective,
+        "order_matters": "Yes" if order_matters else "No",
+        "num_vars_per_state": num_vars,
+        "iteration_count": 0,
+        "calculated_states": calculate_number_of_possible_states(stored, num_vars, order_matters),
+        "fully_explored": False,
+    }
+    apply_state(problem, state or {})
+    os.makedirs(problems_dir, exist_ok=True)
+    filename = problem_filename(title, problems_dir)
+    ProblemStore(filename).commit(problem)
+    return {"title": title, "file": filename, "state": current_state(problem), "calculated_states": problem["calculated_states"]}
+
+
+def current_state(iteration):
+    return {var['name']: var['current_value'] for var in iteration['variables']}
+
+
+def record_result(title, value, state=None, problems_dir=PROBLEMS_DIR):
+    """ Record the measured value of the pending state, optionally correcting the state that was actually tried """
+    store = get_store(find_problem(title, problems_dir))
+    iteration = store.iterations[-1]
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise CommandError(f"The result must be a number, got '{value}'")
+    apply_state(iteration, state or {})
+    iteration['optimized_variable']['value'] = value
+    iteration['measured'] = True
+    # Same iteration_count, so the commit amends the pending iteration
+    store.commit(iteration)
+    return {"title": title, "iteration": iteration['iteration_count'], "state": current_state(iteration), "value": value}
+
+
+def suggest_next(title, problems_dir=PROBLEMS_DIR):
+    """ Run the problem's algorithm and append its suggestion as the next pending state """
+    filename = find_problem(title, problems_dir)
+    store = get_store(filename)
+    if store.iterations[-1].get('fully_explored'):
+        return {"title": title, "state": None, "message": EXPLORED_MESSAGE}
+    if not store.iterations[-1].get('measured'):
+        # Otherwise the placeholder value of the pending state would be taken for its result
+        raise CommandError(f"Record the result of the pending state of '{title}' before asking for a suggestion")
+    # The algorithms print their progress; standard output is kept for the JSON results
+    with contextlib.redirect_stdout(sys.stderr):
+        new_params = algorithm_for(store.iterations[-1]).suggest(filename, title)
+    # record committed the result, so only the suggestion is appended
+    if not record_suggestion(store, new_params, result_committed=True):
+        return {"title": title, "state": None, "message": EXPLORED_MESSAGE}
+    return {"title": title, "iteration": store.iterations[-1]['iteration_count'], "state": current_state(store.iterations[-1])}
+
+
+def show_problem(title, problems_dir=PROBLEMS_DIR):
+    filename = find_problem(title, problems_dir)
+    store = get_store(filename)
+    summary = summarize(store.iterations, os.stat(filename))
+    return {
+        "title": summary['title'],
+        "algorithm": store.iterations[-1].get('algorithm'),
+        "iteration_count": summary['iteration_count'],
+        "best_value": summary['best_value'],
+        "fully_explored": summary['fully_explored'],
+        "pending_state": current_state(store.iterations[-1]),
+    }
+
+
+def list_problems(problems_dir=PROBLEMS_DIR):
+    summaries = get_problem_index(problems_dir).refresh()
+    return [
+        {key: summary[key] for key in ("title", "iteration_count", "best_value", "fully_explored")}
+        for summary in sorted(summaries, key=lambda summary: summary['title'])
+    ]
+
+
+def run_operation(operation, problems_dir=PROBLEMS_DIR):
+    """ Run one batch operation, a dict with a command and the arguments of that command """
+    operation = dict(operation)
+    command = operation.pop("command", None)
+    commands = {
+        "create": create_problem,
+        "record": record_result,
+        "suggest": suggest_next,
+        "show": show_problem,
+    }
+    if command not in commands:
+        raise CommandError(f"Unknown command '{command}'; expected one of {', '.join(commands)}")
+    if command == "create":
+        # Variables may be given in the command line syntax as well
+        operation["variables"] = [parse_variable(spec) if isinstance(spec, str) else spec for spec in operation.get("variables", [])]
+    try:
+        return commands[command](**operation, problems_dir=problems_dir)
+    except TypeError as e:
+        raise CommandError(f"Bad arguments for {command}: {e}")
+
+
+def read_operations(source):
+    if source == "-":
+        content = sys.stdin.read()
+    else:
+        with open(source, 'r') as file:
+            content = file.read()
+    if content.lstrip().startswith('['):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def run_batch(source, problems_dir=PROBLEMS_DIR):
+    results = []
+    for operation in read_operations(source):
+        try:
+            results.append({"ok": True, **run_operation(operation, problems_dir)})
+        except Exception as e:
+            # One failing operation, whatever the cause, must not lose the results of the others
+            error = str(e) if isinstance(e, CommandError) else f"{type(e).__name__}: {e}"
+            results.append({"ok": False, "error": error, "operation": operation})
+    return results
+
+
+def parse_assignments(assignments):
+    state = {}
+    for assignment in assignments or []:
+        name, separator, value = assignment.partition('=')
+        if not separator:
+            raise CommandError(f"Expected NAME=VALUE, got '{assignment}'")
+        state[name] = value
+    return state
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Create problems, record results and get suggestions without the GUI.")
+    parser.add_argument("--problems-dir", default=PROBLEMS_DIR, help=f"directory that holds the problem files (default: {PROBLEMS_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="create a problem")
+    create.add_argument("title")
+    create.add_argument("--variable", action="append", required=True, metavar="NAME:TYPE[:VALUES]",
+                        help="NAME:Boolean, NAME:Numerical:MIN..MAX[/STEP] or NAME:Categorical:A,B,C; repeat for every variable")
+    create.add_argument("--optimized-variable", required=True, help="name of the measured result")
+    create.add_argument("--algorithm", choices=list(ALGORITHMS), default="Hill Climbing")
+    create.add_argument("--objective", choices=OBJECTIVES, default="Maximize")
+    create.add_argument("--order-matters", action="store_true")
+    create.add_argument("--vars-per-state", type=int, default=None)
+    create.add_argument("--description", default="")
+    create.add_argument("--set", action="append", metavar="NAME=VALUE", help="initial value of a variable")
+
+    record = commands.add_parser("record", help="record the measured result of the pending state")
+    record.add_argument("title")
+    record.add_argument("value")
+    record.add_argument("--set", action="append", metavar="NAME=VALUE", help="value a variable actually had, if it differed from the suggestion")
+
+    suggest = commands.add_parser("suggest", help="suggest the next state of one or more problems whose pending result was recorded")
+    suggest.add_argument("titles", nargs="+")
+
+    show = commands.add_parser("show", help="summarise a problem")
+    show.add_argument("title")
+
+    commands.add_parser("list", help="list the problems")
+
+    batch = commands.add_parser("batch", help="run the operations in a JSON lines file ('-' for standard input)")
+    batch.add_argument("source")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    problems_dir = args.problems_dir
+    try:
+        if args.command == "create":
+            output = create_problem(args.title, [parse_variable(text) for text in args.variable], args.optimized_variable,
+                                    args.algorithm, args.objective, args.order_matters, args.vars_per_state,
+                                    args.description, parse_assignments(args.set), problems_dir)
+        elif args.command == "record":
+            output = record_result(args.title, args.value, parse_assignments(args.set), problems_dir)
+        elif args.command == "suggest":
+            output = [suggest_next(title, problems_dir) for title in args.titles]
+            output = output[0] if len(output) == 1 else output
+        elif args.command == "show":
+            output = show_problem(args.title, problems_dir)
+        elif args.command == "list":
+            output = list_problems(problems_dir)
+        else:
+            output = run_batch(args.source, problems_dir)
+    except (CommandError, OSError, json.JSONDecodeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(output, indent=2))
+    return 1 if args.command == "batch" and not all(result["ok"] for result in output) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
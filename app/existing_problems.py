@@ -1,7 +1,9 @@
 import os
-import json
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QListWidget, QListWidgetItem, QPushButton, QHBoxLayout, QLabel, QMessageBox)
 from PyQt5.QtCore import pyqtSignal, pyqtSlot, QObject
+from .utils.problem_store import PROBLEMS_DIR
+from .utils.problem_index import get_problem_index
+from .utils.profiling import profiled
 
 class ExistingProblemsTab(QWidget):
     
@@ -18,26 +20,26 @@ class ExistingProblemsTab(QWidget):
         self.problem_list = QListWidget()
         layout.addWidget(self.problem_list)
 
+        # Row of every listed problem by file path: (list item, its widget, title label, current state button)
+        self.rows = {}
         self.load_problems()
 
+    @profiled()
     def load_problems(self):
-        # Clear the existing list
-        self.problem_list.clear()
-
-        problems_dir = os.path.join(os.path.dirname(__file__), '../problems')
-        if not os.path.exists(problems_dir):
-            os.makedirs(problems_dir)
-
-        for filename in os.listdir(problems_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(problems_dir, filename)
-                with open(filepath, 'r') as file:
-                    problem_data = json.load(file)
-                    if problem_data:
-                        problem_title = problem_data[-1]['title']
-                        self.add_problem_item(problem_title, filepath, problem_data)
-
-    def add_problem_item(self, title, filepath, problem_data):
+        # The library index only stats the files and re-reads the ones that changed;
+        # rows are only added, updated or removed where the library changed
+        seen = set()
+        for summary in get_problem_index(PROBLEMS_DIR).refresh():
+            filepath = summary['path']
+            seen.add(filepath)
+            if filepath in self.rows:
+                self.update_problem_item(filepath, summary)
+            else:
+                self.add_problem_item(summary['title'], filepath, summary)
+        for filepath in [filepath for filepath in self.rows if filepath not in seen]:
+            self.remove_problem_item(filepath)
+
+    def add_problem_item(self, title, filepath, summary):
         item_widget = QWidget()
         item_layout = QHBoxLayout(item_widget)
         item_layout.setContentsMargins(0, 0, 0, 0)
@@ -47,12 +49,6 @@ class ExistingProblemsTab(QWidget):
 
         current_state_button = QPushButton("Current State")
         current_state_button.clicked.connect(lambda: self.view_current_state(filepath))
-
-        # Check if the problem is fully explored
-        if problem_data and problem_data[-1].get('fully_explored'):
-            current_state_button.setEnabled(False)
-            current_state_button.setText("Fully Explored")
-
         item_layout.addWidget(current_state_button)
 
         edit_button = QPushButton("Edit Problem")
@@ -76,6 +72,23 @@ class ExistingProblemsTab(QWidget):
 
         self.problem_list.addItem(item)
         self.problem_list.setItemWidget(item, item_widget)
+        self.rows[filepath] = (item, item_widget, title_label, current_state_button)
+        self.update_problem_item(filepath, summary)
+
+    def update_problem_item(self, filepath, summary):
+        _, _, title_label, current_state_button = self.rows[filepath]
+        if title_label.text() != summary['title']:
+            title_label.setText(summary['title'])
+        # Check if the problem is fully explored
+        explored = summary['fully_explored']
+        if current_state_button.isEnabled() == explored:
+            current_state_button.setEnabled(not explored)
+            current_state_button.setText("Fully Explored" if explored else "Current State")
+
+    def remove_problem_item(self, filepath):
+        item, item_widget, _, _ = self.rows.pop(filepath)
+        self.problem_list.takeItem(self.problem_list.row(item))
+        item_widget.deleteLater()
 
     def view_current_state(self, filepath):
         # Add logic to view the current state
@@ -97,10 +110,4 @@ class ExistingProblemsTab(QWidget):
             reply = QMessageBox.question(self, "Delete Problem", "Are you sure you want to delete this problem?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
                 os.remove(filepath)
-                # Find the corresponding QListWidgetItem
-                for index in range(self.problem_list.count()):
-                    item = self.problem_list.item(index)
-                    if self.problem_list.itemWidget(item) == item_widget:
-                        self.problem_list.takeItem(index)
-                        item_widget.deleteLater()
-                        break
+                self.remove_problem_item(filepath)
@@ -0,0 +1,334 @@
+from PyQt5.QtCore import QAbstractTableModel, QEvent, QModelIndex, QRegularExpression, Qt, pyqtSignal
+from PyQt5.QtGui import QRegularExpressionValidator
+from PyQt5.QtWidgets import QApplication, QComboBox, QCompleter, QLineEdit, QSpinBox, QStyle, QStyledItemDelegate, QStyleOptionButton
+from .utils.domains import canonical_value, variable_domain
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """
+    Paints a cell as a push button labelled with the cell's text and emits
+    clicked(row) when it is clicked. Nothing is instantiated per row, so a
+    column of buttons costs the same for ten rows as for ten thousand.
+    """
+
+    clicked = pyqtSignal(int)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data()
+        button.state = QStyle.State_Enabled | QStyle.State_Raised
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton and option.rect.contains(event.pos()):
+            self.clicked.emit(index.row())
+            return True
+        return False
+
+
+class CategoryListModel(QAbstractTableModel):
+    """ The categories of the variable being defined; one row per category, with Edit and Delete buttons """
+
+    CATEGORY, EDIT, DELETE = range(3)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._categories = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._categories)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 3
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        if index.column() == self.CATEGORY:
+            return self._categories[index.row()]
+        return "Edit" if index.column() == self.EDIT else "Delete"
+
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled
+        if index.column() == self.CATEGORY:
+            flags |= Qt.ItemIsSelectable | Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        value = str(value).strip()
+        if role != Qt.EditRole or index.column() != self.CATEGORY or not value:
+            return False
+        if value != self._categories[index.row()] and value in self._categories:
+            return False
+        self._categories[index.row()] = value
+        self.dataChanged.emit(index, index)
+        return True
+
+    def categories(self):
+        return list(self._categories)
+
+    def set_categories(self, categories):
+        self.beginResetModel()
+        self._categories = list(categories)
+        self.endResetModel()
+
+    def add(self, category):
+        if category in self._categories:
+            return False
+        self.beginInsertRows(QModelIndex(), len(self._categories), len(self._categories))
+        self._categories.append(category)
+        self.endInsertRows()
+        return True
+
+    def remove(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._categories[row]
+        self.endRemoveRows()
+
+
+class VariableTableModel(QAbstractTableModel):
+    """
+    The variables of the problem being defined, as a table.
+
+    The model works on the page's own list of variable dicts, so the page
+    keeps reading self.variables as before; changes have to go through the
+    model so that only the affected rows are repainted.
+    """
+
+    NAME, TYPE, VALUES, INITIAL_VALUE, EDIT, DELETE = range(6)
+    HEADERS = ("Name", "Type", "Values", "Initial Value", "", "")
+
+    def __init__(self, variables, parent=None):
+        super().__init__(parent)
+        self.variables = variables
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.variables)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        var = self.variables[index.row()]
+        column = index.column()
+        if column == self.NAME:
+            return var['name']
+        if column == self.TYPE:
+            return var['type']
+        if column == self.VALUES:
+            return self.describe_values(var)
+        if column == self.INITIAL_VALUE:
+            return var['current_value'] if role == Qt.EditRole else str(var['current_value'])
+        return "Edit" if column == self.EDIT else "Delete"
+
+    def describe_values(self, var):
+        if var['type'] == "Numerical":
+            domain = variable_domain(var)
+            return f"{domain[0]} to {domain[-1]}"
+        if var['type'] == "Categorical":
+            return ", ".join(str(value) for value in var['possible_values'])
+        return "True, False"
+
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled
+        if index.column() == self.INITIAL_VALUE:
+            flags |= Qt.ItemIsSelectable | Qt.ItemIsEditable
+        elif index.column() < self.EDIT:
+            flags |= Qt.ItemIsSelectable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or index.column() != self.INITIAL_VALUE:
+            return False
+        var = self.variables[index.row()]
+        var['current_value'] = canonical_value(value, var['type'])
+        self.dataChanged.emit(index, index)
+        return True
+
+    def domain(self, row):
+        # Variables are still being defined here, so there is no compiled schema to read their domain from
+        return variable_domain(self.variables[row])
+
+    def value_type(self, row):
+        return self.variables[row]['type']
+
+    def set_variables(self, variables):
+        self.beginResetModel()
+        self.variables = variables
+        self.endResetModel()
+
+    def row_of(self, variable_details):
+        # Rows move when earlier variables are deleted, so callers hold on to the dict instead
+        return next(row for row, var in enumerate(self.variables) if var is variable_details)
+
+    def append(self, variable_details):
+        self.beginInsertRows(QModelIndex(), len(self.variables), len(self.variables))
+        self.variables.append(variable_details)
+        self.endInsertRows()
+
+    def remove(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.variables[row]
+        self.endRemoveRows()
+
+    def variable_changed(self, row):
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+
+class IterationVariableModel(QAbstractTableModel):
+    """
+    The variables of the iteration shown on the iterative optimization page.
+
+    Values and locks are edited in the iteration's own variable dicts, the
+    way the page's lock combos already updated them; the value editors are
+    only created by the delegate while a cell is being edited. Types and
+    domains come from the problem's ProblemSchema, row i being variable i.
+    """
+
+    NAME, VALUE, LOCK_VALUE, ORDER, LOCK_ORDER = range(5)
+    HEADERS = ("Variable", "Value", "Lock Value", "Order", "Lock Order")
+
+    def __init__(self, iteration, schema, parent=None):
+        super().__init__(parent)
+        self.set_iteration(iteration, schema)
+
+    def set_iteration(self, iteration, schema):
+        self.beginResetModel()
+        self.variables = iteration['variables']
+        self.schema = schema
+        self.order_matters = iteration['order_matters'] == "Yes"
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.variables)
+
+    def columnCount(self, parent=QModelIndex()):
+        # The order columns only exist when order matters
+        return 0 if parent.isValid() else (5 if self.order_matters else 3)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        var = self.variables[index.row()]
+        column = index.column()
+        if role == Qt.CheckStateRole:
+            if column == self.LOCK_VALUE:
+                return Qt.Checked if var['lock_value'] else Qt.Unchecked
+            if column == self.LOCK_ORDER:
+                return Qt.Checked if var['lock_order'] else Qt.Unchecked
+            return None
+        if role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        if column == self.NAME:
+            return var['name']
+        if column == self.VALUE:
+            return var['current_value'] if role == Qt.EditRole else str(var['current_value'])
+        if column == self.ORDER:
+            return str(var['order'])
+        return None
+
+    def flags(self, index):
+        column = index.column()
+        if column == self.VALUE:
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+        if column in (self.LOCK_VALUE, self.LOCK_ORDER):
+            return Qt.ItemIsEnabled | Qt.ItemIsUserCheckable
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def domain(self, row):
+        return self.schema.domains[row]
+
+    def value_type(self, row):
+        return self.schema.types[row]
+
+    def setData(self, index, value, role=Qt.EditRole):
+        var = self.variables[index.row()]
+        column = index.column()
+        if role == Qt.CheckStateRole and column in (self.LOCK_VALUE, self.LOCK_ORDER):
+            var['lock_value' if column == self.LOCK_VALUE else 'lock_order'] = value == Qt.Checked
+        elif role == Qt.EditRole and column == self.VALUE:
+            value = canonical_value(value, self.value_type(index.row()))
+            if value not in self.domain(index.row()):
+                return False
+            var['current_value'] = value
+        else:
+            return False
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+
+class VariableValueDelegate(QStyledItemDelegate):
+    """
+    Edits the value of a variable in a model that answers domain(row) and
+    value_type(row) for each of its rows. Numerical variables get a spin box, or a line edit
+    that only takes integers when their range does not fit the spin box's
+    32-bit int; categorical ones with more than large_domain values get a
+    line edit that completes on any part of a value instead of a combo box
+    holding all of them.
+    """
+
+    large_domain = 50
+    # QSpinBox holds a C int
+    spin_box_range = range(-2 ** 31, 2 ** 31)
+
+    def createEditor(self, parent, option, index):
+        domain = index.model().domain(index.row())
+        if isinstance(domain, range) and domain[0] in self.spin_box_range and domain[-1] in self.spin_box_range:
+            # A spin box covers the whole range without creating an item per value
+            editor = QSpinBox(parent)
+            editor.setRange(domain[0], domain[-1])
+            editor.setSingleStep(domain.step)
+        elif isinstance(domain, range):
+            editor = QLineEdit(parent)
+            editor.setValidator(QRegularExpressionValidator(QRegularExpression(r"-?\d+"), editor))
+        elif len(domain) > self.large_domain:
+            editor = QLineEdit(parent)
+            completer = QCompleter([str(value) for value in domain], editor)
+            completer.setCaseSensitivity(Qt.CaseInsensitive)
+            completer.setFilterMode(Qt.MatchContains)
+            editor.setCompleter(completer)
+        else:
+            editor = QComboBox(parent)
+            editor.addItems([str(value) for value in domain])
+        return editor
+
+    def setEditorData(self, editor, index):
+        value = index.data(Qt.EditRole)
+        if isinstance(editor, QSpinBox):
+            editor.setValue(int(value))
+        elif isinstance(editor, QLineEdit):
+            editor.setText(str(value))
+        else:
+            editor.setCurrentText(str(value))
+
+    def setModelData(self, editor, model, index):
+        domain = model.domain(index.row())
+        if isinstance(editor, QSpinBox):
+            # A value typed in between two steps is snapped to the nearest one
+            steps = round((editor.value() - domain.start) / domain.step)
+            value = domain[min(max(steps, 0), len(domain) - 1)]
+        elif isinstance(editor, QLineEdit):
+            # Text that matches no value, such as a number off the step, leaves the variable unchanged
+            try:
+                value = canonical_value(editor.text().strip(), model.value_type(index.row()))
+            except ValueError:
+                return
+            if value not in domain:
+                return
+        else:
+            value = editor.currentText()
+        model.setData(index, value)
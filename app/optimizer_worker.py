@@ -0,0 +1,124 @@
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+from app.algorithms.optimization_algorithm import OptimizationCancelled
+from app.algorithms.session import OptimizationSession
+
+class SuggestionWorker(QObject):
+    """
+    Computes the next suggestion for one problem on a background thread.
+    """
+
+    progress = pyqtSignal(str, int)  # message, percentage or -1 when unknown
+    finished = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+        self.filename = session.filename
+        self._cancel_requested = False
+
+    def cancel(self):
+        # Read by the optimizer at its next progress report
+        self._cancel_requested = True
+
+    @pyqtSlot()
+    def run(self):
+        optimizer = self.session.algorithm
+        optimizer.cancel_requested = lambda: self._cancel_requested
+        optimizer.progress_callback = self.report
+        try:
+            new_params = self.session.suggest()
+        except OptimizationCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(new_params)
+
+    def report(self, message, fraction):
+        self.progress.emit(message, -1 if fraction is None else int(fraction * 100))
+
+
+class OptimizationRunner(QObject):
+    """
+    Owns the background suggestions of every problem.
+
+    The runner belongs to the application rather than to a page, so a
+    suggestion keeps running (and is recorded) while the user browses other
+    problems. Signals carry the problem filename so pages can pick out the
+    updates that concern them. It also keeps one OptimizationSession per
+    problem, so the optimizer's state survives from one suggestion to the next.
+    """
+
+    progress = pyqtSignal(str, str, int)
+    finished = pyqtSignal(str, object)
+    cancelled = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tasks = {}
+        self.sessions = {}
+
+    def is_running(self, filename):
+        return filename in self.tasks
+
+    def start(self, filename, problem_title):
+        if self.is_running(filename):
+            return
+        session = self.sessions.get(filename)
+        if session is None:
+            session = self.sessions[filename] = OptimizationSession(filename, problem_title)
+        thread = QThread()
+        worker = SuggestionWorker(session)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.progress.connect(self.on_progress)
+        worker.finished.connect(self.on_finished)
+        worker.cancelled.connect(self.on_cancelled)
+        worker.failed.connect(self.on_failed)
+        self.tasks[filename] = (thread, worker)
+        thread.start()
+
+    def cancel(self, filename):
+        if self.is_running(filename):
+            self.tasks[filename][1].cancel()
+
+    def cancel_all(self):
+        for filename in list(self.tasks):
+            self.cancel(filename)
+            self.cleanup(filename)
+
+    @pyqtSlot(str, int)
+    def on_progress(self, message, percent):
+        self.progress.emit(self.sender().filename, message, percent)
+
+    @pyqtSlot(object)
+    def on_finished(self, new_params):
+        filename = self.sender().filename
+        if self.cleanup(filename):
+            self.finished.emit(filename, new_params)
+
+    @pyqtSlot()
+    def on_cancelled(self):
+        filename = self.sender().filename
+        if self.cleanup(filename):
+            self.cancelled.emit(filename)
+
+    @pyqtSlot(str)
+    def on_failed(self, message):
+        filename = self.sender().filename
+        if self.cleanup(filename):
+            self.failed.emit(filename, message)
+
+    def cleanup(self, filename):
+        # Returns False when the task was already dropped, e.g. by cancel_all on exit
+        if filename not in self.tasks:
+            return False
+        thread, worker = self.tasks.pop(filename)
+        thread.quit()
+        thread.wait()
+        worker.deleteLater()
+        thread.deleteLater()
+        return True
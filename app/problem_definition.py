@@ -1,11 +1,14 @@
 import os
-import json
-from PyQt5.QtWidgets import (QMainWindow, QVBoxLayout, QLabel, QLineEdit, QTextEdit, QComboBox, QListWidget, QPushButton, QFormLayout, QHBoxLayout, QWidget, QTabWidget, QMessageBox, QSpinBox, QInputDialog, QListWidgetItem)
+from PyQt5.QtWidgets import (QMainWindow, QVBoxLayout, QLabel, QLineEdit, QTextEdit, QComboBox, QPushButton, QFormLayout, QHBoxLayout, QWidget, QTabWidget, QMessageBox, QSpinBox, QInputDialog, QTableView, QHeaderView, QAbstractItemView)
 from PyQt5.QtGui import QIntValidator
 from PyQt5.QtCore import Qt, QTimer
 # from .utils.validations import validate_numeric_input, validate_title
 from .utils.calculations import calculate_number_of_possible_states
 from .existing_problems import ExistingProblemsTab
+from .list_models import ButtonDelegate, CategoryListModel, VariableValueDelegate, VariableTableModel
+from .utils.problem_store import PROBLEMS_DIR, ProblemStore, problem_exists, problem_filename
+from .utils.domains import numeric_range, variable_domain
+from .utils.profiling import profiled
 
 class ProblemDefinitionPage(QMainWindow):
     def __init__(self, app):
@@ -65,9 +68,24 @@ class ProblemDefinitionPage(QMainWindow):
         desc_layout.addRow(QLabel("Problem Description:"), self.desc_text_edit)
         layout.addLayout(desc_layout)
 
-        # Initialize variable display layout
-        self.variable_display_layout = QVBoxLayout()
-        layout.addLayout(self.variable_display_layout)
+        # Variables added so far; only the rows on screen are painted
+        self.variable_model = VariableTableModel(self.variables, self)
+        self.variables_view = QTableView()
+        self.variables_view.setModel(self.variable_model)
+        self.variables_view.verticalHeader().setVisible(False)
+        self.variables_view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.variables_view.horizontalHeader().setSectionResizeMode(VariableTableModel.VALUES, QHeaderView.Stretch)
+        self.variables_view.setSelectionMode(QAbstractItemView.NoSelection)
+        self.variables_view.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.SelectedClicked | QAbstractItemView.EditKeyPressed)
+        self.variables_view.setItemDelegateForColumn(VariableTableModel.INITIAL_VALUE, VariableValueDelegate(self.variables_view))
+        self.edit_variable_delegate = ButtonDelegate(self.variables_view)
+        self.edit_variable_delegate.clicked.connect(lambda row: self.edit_variable(self.variables[row]))
+        self.variables_view.setItemDelegateForColumn(VariableTableModel.EDIT, self.edit_variable_delegate)
+        self.delete_variable_delegate = ButtonDelegate(self.variables_view)
+        self.delete_variable_delegate.clicked.connect(lambda row: self.delete_variable(self.variables[row]))
+        self.variables_view.setItemDelegateForColumn(VariableTableModel.DELETE, self.delete_variable_delegate)
+        self.variable_model.dataChanged.connect(self.update_possible_states)
+        layout.addWidget(self.variables_view)
 
         # Problem Variable Entry Fields
         var_layout = QHBoxLayout()
@@ -93,7 +111,19 @@ class ProblemDefinitionPage(QMainWindow):
 
         cat_layout = QVBoxLayout()
         self.categories_label = QLabel("Added Categories:")
-        self.categories_list = QListWidget()
+        self.category_model = CategoryListModel(self)
+        self.categories_list = QTableView()
+        self.categories_list.setModel(self.category_model)
+        self.categories_list.horizontalHeader().setVisible(False)
+        self.categories_list.verticalHeader().setVisible(False)
+        self.categories_list.horizontalHeader().setSectionResizeMode(CategoryListModel.CATEGORY, QHeaderView.Stretch)
+        self.categories_list.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed)
+        self.edit_category_delegate = ButtonDelegate(self.categories_list)
+        self.edit_category_delegate.clicked.connect(self.edit_category)
+        self.categories_list.setItemDelegateForColumn(CategoryListModel.EDIT, self.edit_category_delegate)
+        self.delete_category_delegate = ButtonDelegate(self.categories_list)
+        self.delete_category_delegate.clicked.connect(self.delete_category)
+        self.categories_list.setItemDelegateForColumn(CategoryListModel.DELETE, self.delete_category_delegate)
         self.categories_list.setVisible(False)  # Initially hidden
         cat_layout.addWidget(self.categories_label)
         cat_layout.addWidget(self.categories_list)
@@ -131,7 +161,7 @@ class ProblemDefinitionPage(QMainWindow):
 
         # Algorithm Selection and Objective Function Setup
         self.algorithm_combo = QComboBox()
-        self.algorithm_combo.addItems(["Select an Algorithm", "Genetic", "Hill Climbing", "Reinforcement Learning", "Test Every Combination"])
+        self.algorithm_combo.addItems(["Select an Algorithm", "Genetic", "Hill Climbing", "Reinforcement Learning", "Surrogate Model", "Test Every Combination"])
         self.objective_function_combo = QComboBox()
         self.objective_function_combo.addItems(["Maximize", "Minimize"])
         
@@ -183,9 +213,10 @@ class ProblemDefinitionPage(QMainWindow):
         # Connect signals for validating inputs
         self.title_entry.textChanged.connect(self.validate_title)
         self.title_entry.textChanged.connect(self.validate_inputs)
-        self.categories_list.itemChanged.connect(self.validate_variable_inputs)
-        self.categories_list.model().rowsRemoved.connect(self.validate_variable_inputs)
-        self.categories_list.model().rowsInserted.connect(self.validate_variable_inputs)
+        self.category_model.dataChanged.connect(self.validate_variable_inputs)
+        self.category_model.rowsRemoved.connect(self.validate_variable_inputs)
+        self.category_model.rowsInserted.connect(self.validate_variable_inputs)
+        self.category_model.modelReset.connect(self.validate_variable_inputs)
         self.optimized_variable_entry.textChanged.connect(self.validate_inputs)
         self.optimization_option_combo.currentIndexChanged.connect(self.validate_inputs)
         self.optimization_option_combo.currentIndexChanged.connect(self.update_optimization_ui)
@@ -198,7 +229,7 @@ class ProblemDefinitionPage(QMainWindow):
         self.order_matters_combo.currentIndexChanged.connect(self.update_possible_states)
         self.min_value_entry.textChanged.connect(self.validate_variable_inputs)
         self.max_value_entry.textChanged.connect(self.validate_variable_inputs)
-        self.submit_button.clicked.connect(self.gather_data)
+        self.submit_button.clicked.connect(lambda: self.gather_data())  # profiled, so clicked's checked flag must not reach it
 
     def update_possible_states(self):
         num_vars = self.num_vars_per_state_spinbox.value()  # Get the value from the QSpinBox
@@ -248,47 +279,22 @@ class ProblemDefinitionPage(QMainWindow):
 
     def add_category(self):
         category = self.categories_entry.text().strip()
-        if category and not any(category == self.categories_list.item(i).text() for i in range(self.categories_list.count())):
-            item_widget = QWidget()
-            item_layout = QHBoxLayout(item_widget)
-            item_layout.setContentsMargins(0, 0, 0, 0)
-
-            category_label = QLabel(category)
-            item_layout.addWidget(category_label)
-
-            edit_button = QPushButton("Edit")
-            edit_button.clicked.connect(lambda: self.edit_category(category_label))
-            item_layout.addWidget(edit_button)
-
-            delete_button = QPushButton("Delete")
-            delete_button.clicked.connect(lambda: self.delete_category(item_widget, category))
-            item_layout.addWidget(delete_button)
-
-            item = QListWidgetItem()
-            item.setSizeHint(item_widget.sizeHint())
-
-            self.categories_list.addItem(item)
-            self.categories_list.setItemWidget(item, item_widget)
+        if category and self.category_model.add(category):
             self.categories_list.setVisible(True)  # Ensure the list is visible
             self.categories_label.setVisible(True)  # Ensure the label is visible
             self.categories_entry.clear()
             self.validate_inputs()
 
-    def edit_category(self, label):
-        current_text = label.text()
+    def edit_category(self, row):
+        current_text = self.category_model.categories()[row]
         new_text, ok = QInputDialog.getText(self, "Edit Category", "Category Name:", QLineEdit.Normal, current_text)
         if ok and new_text.strip():
-            label.setText(new_text.strip())
+            self.category_model.setData(self.category_model.index(row, CategoryListModel.CATEGORY), new_text)
             self.validate_variable_inputs()
             self.validate_inputs()
 
-    def delete_category(self, item_widget, category):
-        for i in range(self.categories_list.count()):
-            item = self.categories_list.item(i)
-            if self.categories_list.itemWidget(item) == item_widget:
-                self.categories_list.takeItem(i)
-                item_widget.deleteLater()
-                break
+    def delete_category(self, row):
+        self.category_model.remove(row)
         self.validate_variable_inputs()
         self.validate_inputs()
 
@@ -296,7 +302,7 @@ class ProblemDefinitionPage(QMainWindow):
         max_visible_items = 5  # Adjust this to set maximum visible items without scrolling
         row_height = self.categories_list.sizeHintForRow(0)
         if row_height > 0:
-            visible_items = min(self.categories_list.count(), max_visible_items)
+            visible_items = min(self.category_model.rowCount(), max_visible_items)
             self.categories_list.setMaximumHeight(row_height * visible_items + 2 * self.categories_list.frameWidth())
 
     def update_variable_type_ui(self):
@@ -307,18 +313,18 @@ class ProblemDefinitionPage(QMainWindow):
         self.min_value_entry.setVisible(is_numeric)
         self.max_label.setVisible(is_numeric)
         self.max_value_entry.setVisible(is_numeric)
-        self.categories_label.setVisible(is_categorical and self.categories_list.count() > 0)
+        self.categories_label.setVisible(is_categorical and self.category_model.rowCount() > 0)
         self.categories_entry.setVisible(is_categorical)
         self.add_category_button.setVisible(is_categorical)
-        self.categories_list.setVisible(is_categorical and self.categories_list.count() > 0)
+        self.categories_list.setVisible(is_categorical and self.category_model.rowCount() > 0)
 
     def add_variable(self):
         var_name = self.variable_entry.text().strip()
         var_type = self.type_combo.currentText()
         if var_name and var_type != "Select Type" and self.validate_numeric_input():
             order = len(self.variables) + 1 if self.order_matters_combo.currentText() == "Yes" else 0
-            categories = [self.categories_list.itemWidget(self.categories_list.item(i)).layout().itemAt(0).widget().text() for i in range(self.categories_list.count())] if var_type == "Categorical" else []
-            possible_values = categories if var_type == "Categorical" else ([True, False] if var_type == "Boolean" else list(range(int(self.min_value_entry.text()), int(self.max_value_entry.text()) + 1)))
+            categories = self.category_model.categories() if var_type == "Categorical" else []
+            possible_values = categories if var_type == "Categorical" else ([True, False] if var_type == "Boolean" else numeric_range(int(self.min_value_entry.text()), int(self.max_value_entry.text())))
             initial_value = categories[0] if categories else (True if var_type == "Boolean" else int(self.min_value_entry.text()))
             variable_details = {
                 "name": var_name,
@@ -330,8 +336,7 @@ class ProblemDefinitionPage(QMainWindow):
                 "lock_value": False,
                 "impact_score": 0,
             }
-            self.variables.append(variable_details)
-            self.display_variable(variable_details)
+            self.variable_model.append(variable_details)
             self.validate_inputs()
             self.clear_variable_inputs()
             self.num_vars_per_state_spinbox.setRange(1, len(self.variables))  # Update range of variables per state
@@ -340,73 +345,28 @@ class ProblemDefinitionPage(QMainWindow):
 
             
 
-    def display_variable(self, variable_details):
-        display_widget = QWidget()
-        display_layout = QHBoxLayout(display_widget)
-        display_layout.addWidget(QLabel(variable_details['name']))
-
-        value_combo = QComboBox()
-        for value in variable_details['possible_values']:
-            value_combo.addItem(str(value))
-        value_combo.setCurrentText(str(variable_details['current_value']))
-        value_combo.currentTextChanged.connect(lambda value, var=variable_details: self.update_initial_value(var, value))
-        display_layout.addWidget(value_combo)
-
-        # Add Edit Button
-        edit_button = QPushButton("Edit")
-        edit_button.clicked.connect(lambda: self.edit_variable(variable_details, display_widget))
-        display_layout.addWidget(edit_button)
-
-        # Add Delete Button
-        delete_button = QPushButton("Delete")
-        delete_button.clicked.connect(lambda: self.delete_variable(variable_details, display_widget))
-        display_layout.addWidget(delete_button)
-
-        self.variable_display_layout.addWidget(display_widget)
-
-    def edit_variable(self, variable_details, widget):
+    def edit_variable(self, variable_details):
         # Load variable details back to input fields
         self.variable_entry.setText(variable_details['name'])
         self.type_combo.setCurrentText(variable_details['type'])
         if variable_details['type'] == "Numerical":
-            self.min_value_entry.setText(str(min(variable_details['possible_values'])))
-            self.max_value_entry.setText(str(max(variable_details['possible_values'])))
+            domain = variable_domain(variable_details)
+            self.min_value_entry.setText(str(domain[0]))
+            self.max_value_entry.setText(str(domain[-1]))
         elif variable_details['type'] == "Categorical":
-            self.categories_list.clear()
-            for category in variable_details['possible_values']:
-                item_widget = QWidget()
-                item_layout = QHBoxLayout(item_widget)
-                item_layout.setContentsMargins(0, 0, 0, 0)
-
-                category_label = QLabel(category)
-                item_layout.addWidget(category_label)
-
-                edit_button = QPushButton("Edit")
-                edit_button.clicked.connect(lambda: self.edit_category(category_label))
-                item_layout.addWidget(edit_button)
-
-                delete_button = QPushButton("Delete")
-                delete_button.clicked.connect(lambda: self.delete_category(item_widget, category))
-                item_layout.addWidget(delete_button)
-
-                item = QListWidgetItem()
-                item.setSizeHint(item_widget.sizeHint())
-
-                self.categories_list.addItem(item)
-                self.categories_list.setItemWidget(item, item_widget)
-
+            self.category_model.set_categories(variable_details['possible_values'])
             self.categories_list.setVisible(True)
             self.categories_label.setVisible(True)
 
-        self.toggle_widget_visibility(widget, False)  # Hide the widget during editing
+        self.variables_view.setRowHidden(self.variable_model.row_of(variable_details), True)  # Hide the row during editing
 
         # Add functionality to update the existing variable
         self.add_variable_button.disconnect()
-        self.add_variable_button.clicked.connect(lambda: self.update_variable(variable_details, widget))
+        self.add_variable_button.clicked.connect(lambda: self.update_variable(variable_details))
         self.add_variable_button.setText("Update Variable")
         self.validate_inputs()
 
-    def update_variable(self, variable_details, widget):
+    def update_variable(self, variable_details):
         var_name = self.variable_entry.text().strip()
         var_type = self.type_combo.currentText()
         
@@ -417,10 +377,10 @@ class ProblemDefinitionPage(QMainWindow):
         elif var_type == "Numerical":
             min_val = int(self.min_value_entry.text())
             max_val = int(self.max_value_entry.text())
-            possible_values = list(range(min_val, max_val + 1))
+            possible_values = numeric_range(min_val, max_val)
             current_value = min_val
         elif var_type == "Categorical":
-            categories = [self.categories_list.itemWidget(self.categories_list.item(i)).layout().itemAt(0).widget().text() for i in range(self.categories_list.count())]
+            categories = self.category_model.categories()
             possible_values = categories
             current_value = categories[0] if categories else None
 
@@ -430,15 +390,12 @@ class ProblemDefinitionPage(QMainWindow):
         variable_details['possible_values'] = possible_values
         variable_details['current_value'] = current_value
 
-        # Remove the old display widget and clear the layout
-        self.variable_display_layout.removeWidget(widget)
+        # Only the edited row is repainted
+        row = self.variable_model.row_of(variable_details)
+        self.variable_model.variable_changed(row)
+        self.variables_view.setRowHidden(row, False)
         self.num_vars_per_state_spinbox.setValue(len(self.variables))  # Update number of variables per state to new total
 
-        widget.deleteLater()
-
-        # Redisplay all variables to ensure UI consistency
-        self.redisplay_all_variables()
-
         # Restore the button to original "Add Variable" functionality
         self.add_variable_button.setText("Add Variable")
         self.add_variable_button.disconnect()
@@ -448,9 +405,8 @@ class ProblemDefinitionPage(QMainWindow):
         self.update_possible_states()  # Update the possible states count
         self.validate_inputs()  # Revalidate all inputs
 
-    def delete_variable(self, variable_details, widget):
-        self.variables.remove(variable_details)
-        widget.setParent(None)
+    def delete_variable(self, variable_details):
+        self.variable_model.remove(self.variable_model.row_of(variable_details))
         # Update order of remaining variables
         if self.order_matters_combo.currentText() == "Yes":
             for index, variable in enumerate(self.variables):
@@ -464,31 +420,13 @@ class ProblemDefinitionPage(QMainWindow):
         self.type_combo.setCurrentIndex(0)
         self.min_value_entry.clear()
         self.max_value_entry.clear()
-        self.categories_list.clear()
+        self.category_model.set_categories([])
         self.add_variable_button.setText("Add Variable")
         self.add_variable_button.disconnect()
         self.add_variable_button.clicked.connect(self.add_variable)
         self.update_possible_states()
         self.validate_inputs()
 
-    def update_initial_value(self, variable_details, value):
-        variable_details['current_value'] = type(variable_details['possible_values'][0])(value)
-        self.update_possible_states()
-
-    def redisplay_all_variables(self):
-        # Clear the current display
-        while self.variable_display_layout.count():
-            child = self.variable_display_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-        # Redisplay all variables
-        for var in self.variables:
-            self.display_variable(var)
-
-    def toggle_widget_visibility(self, widget, visible=True):
-        widget.setVisible(visible)
-
     def validate_numeric_input(self):
         if self.type_combo.currentText() == "Numerical":
             min_val = self.min_value_entry.text()
@@ -501,8 +439,7 @@ class ProblemDefinitionPage(QMainWindow):
 
     def validate_title(self):
         title = self.title_entry.text().strip()
-        filename = os.path.join("problems", f"{title.replace(' ', '_')}.json")
-        if os.path.exists(filename):
+        if problem_exists(title):
             self.title_error_label.setText("Title already used. Please choose a different title.")
             self.title_error_label.setVisible(True)
             return False
@@ -520,7 +457,7 @@ class ProblemDefinitionPage(QMainWindow):
             max_val = self.max_value_entry.text()
             is_valid = bool(var_name and min_val.isdigit() and max_val.isdigit() and int(min_val) < int(max_val))
         elif var_type == "Categorical":
-            is_valid = bool(var_name and self.categories_list.count() > 0)
+            is_valid = bool(var_name and self.category_model.rowCount() > 0)
         else:
             is_valid = False
 
@@ -540,6 +477,7 @@ class ProblemDefinitionPage(QMainWindow):
 
         self.submit_button.setEnabled(all_conditions_met)
 
+    @profiled()
     def gather_data(self):
         problem_data = {
             "title": self.title_entry.text().strip(),
@@ -560,26 +498,12 @@ class ProblemDefinitionPage(QMainWindow):
         }
         
         # Create the problems directory if it doesn't exist
-        if not os.path.exists("problems"):
-            os.makedirs("problems")
-        
-        # Define the filename
-        title = problem_data["title"].replace(" ", "_")  # Replace spaces with underscores for the filename
-        filename = os.path.join("problems", f"{title}.json")
-        
-        # Load existing data if the file exists, otherwise start with an empty list
-        if os.path.exists(filename):
-            with open(filename, "r") as file:
-                data = json.load(file)
-        else:
-            data = []
-        
-        # Append the new problem data
-        data.append(problem_data)
+        if not os.path.exists(PROBLEMS_DIR):
+            os.makedirs(PROBLEMS_DIR)
         
-        # Save the updated list back to the file
-        with open(filename, "w") as file:
-            json.dump(data, file, indent=4)
+        # Append the new problem as the first entry of its iteration log
+        filename = problem_filename(problem_data["title"])
+        ProblemStore(filename).commit(problem_data)
 
         self.clear_form()  # Clear the form after submission
         print(f"Data saved to {filename}")
@@ -596,7 +520,7 @@ class ProblemDefinitionPage(QMainWindow):
         self.type_combo.setCurrentIndex(0)
         self.min_value_entry.clear()
         self.max_value_entry.clear()
-        self.categories_list.clear()
+        self.category_model.set_categories([])
         self.optimized_variable_entry.clear()
         self.optimization_option_combo.setCurrentIndex(0)
         self.algorithm_combo.setCurrentIndex(0)
@@ -605,10 +529,7 @@ class ProblemDefinitionPage(QMainWindow):
         self.num_vars_per_state_spinbox.setValue(1)
         self.states_label.setText("Number of Possible States: 0")
         self.variables = []
-        while self.variable_display_layout.count():
-            child = self.variable_display_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+        self.variable_model.set_variables(self.variables)
         self.validate_inputs()  # Revalidate the inputs to disable the submit button
 
     def hide_success_message(self):
@@ -1,3 +1,8 @@
+import os
+
+STYLESHEET_PATH = os.path.join(os.path.dirname(__file__), "styling", "dark_theme.qss")
+
+
 def apply_dark_theme(app):
-    with open('app\styling\dark_theme.qss', 'r') as file:
+    with open(STYLESHEET_PATH, 'r') as file:
         app.setStyleSheet(file.read())
\ No newline at end of file
@@ -0,0 +1,58 @@
+BOOLEAN_DOMAIN = (False, True)
+
+
+def numeric_range(min_value, max_value, step=1):
+    """ Descriptor stored in possible_values for a Numerical variable, instead of every value """
+    return {"min": min_value, "max": max_value, "step": step}
+
+
+def variable_type(var):
+    # Simulated problems spell the types in lower case
+    return var['type'].capitalize()
+
+
+def variable_value(var):
+    return var['current_value'] if 'current_value' in var else var['value']
+
+
+def canonical_value(value, var_type):
+    if var_type == 'Boolean':
+        return value == 'True' if isinstance(value, str) else bool(value)
+    elif var_type == 'Numerical':
+        return int(value)
+    elif var_type == 'Categorical':
+        return str(value)
+    return value
+
+
+def variable_domain(var):
+    """
+    The values a variable can take, as a sequence.
+
+    Numerical variables come back as a range built from their {min, max, step}
+    descriptor, which answers len(), `in` and index() in O(1) without ever
+    materialising the values. Problems saved before the descriptor existed
+    store a full list; an evenly spaced list is turned into a range as well.
+    """
+    var_type = variable_type(var)
+    if var_type == 'Boolean':
+        return BOOLEAN_DOMAIN
+    possible_values = var['possible_values']
+    if isinstance(possible_values, dict):
+        return range(possible_values['min'], possible_values['max'] + 1, possible_values.get('step', 1))
+    values = [canonical_value(value, var_type) for value in possible_values]
+    if var_type == 'Numerical' and len(values) > 1:
+        step = values[1] - values[0]
+        candidate = range(values[0], values[-1] + step, step) if step else None
+        if candidate is not None and len(candidate) == len(values) and candidate[-1] == values[-1]:
+            return candidate
+    return values
+
+
+def domain_size(var):
+    if variable_type(var) == 'Boolean':
+        return len(BOOLEAN_DOMAIN)
+    possible_values = var['possible_values']
+    if isinstance(possible_values, dict):
+        return len(variable_domain(var))
+    return len(possible_values)
@@ -0,0 +1,104 @@
+from app.utils.calculations import calculate_number_of_possible_states
+from app.utils.domains import canonical_value
+
+EXPLORED_MESSAGE = "All possible states explored."
+
+
+def state_orders(current_iteration, new_params):
+    """
+    The order field of every variable in the state described by new_params.
+
+    A state that arranges its variables, or uses only num_vars_per_state of
+    them, lists them in new_params in that order: they are numbered from 1
+    and the variables left out get 0. Other states keep the current orders.
+    """
+    variables = current_iteration['variables']
+    if current_iteration['order_matters'] != "Yes" and len(new_params) == len(variables):
+        return [var['order'] for var in variables]
+    positions = {name: position for position, name in enumerate(new_params, start=1)}
+    return [positions.get(var['name'], 0) for var in variables]
+
+
+def next_iteration(current_iteration, new_params, value=0):
+    """ Build the iteration that follows current_iteration with the variables set to new_params; variables left out keep their value """
+    orders = state_orders(current_iteration, new_params)
+    return {
+        "title": current_iteration['title'],
+        "description": current_iteration['description'],
+        "variables": [
+            {
+                "name": var['name'],
+                "type": var['type'],
+                "possible_values": var['possible_values'],
+                "current_value": canonical_value(new_params[var['name']], var['type']) if var['name'] in new_params else var['current_value'],
+                "order": order,
+                "lock_order": var['lock_order'],
+                "lock_value": var['lock_value'],
+                "impact_score": var['impact_score'],
+            }
+            for var, order in zip(current_iteration['variables'], orders)
+        ],
+        "optimized_variable": {
+            "name": current_iteration['optimized_variable']['name'],
+            "value": value  # Zero until the new iteration has been evaluated
+        },
+        "optimization_option": current_iteration['optimization_option'],
+        "algorithm": current_iteration['algorithm'],
+        "objective": current_iteration['objective'],
+        "order_matters": current_iteration['order_matters'],
+        "num_vars_per_state": current_iteration['num_vars_per_state'],
+        "iteration_count": current_iteration['iteration_count'] + 1,
+        "calculated_states": calculate_number_of_possible_states(
+            current_iteration['variables'],
+            current_iteration['num_vars_per_state'],
+            current_iteration['order_matters'] == "Yes",
+        ),
+        "fully_explored": False,
+    }
+
+
+def record_suggestion(store, new_params, result_committed=False):
+    """
+    Commit the submitted result together with the suggested next iteration;
+    returns False once the problem is fully explored. When the result was
+    committed already, only the new iteration is appended.
+    """
+    current_iteration = store.iterations[-1]
+
+    # Check if all states are explored
+    if new_params == EXPLORED_MESSAGE:
+        # Mark the problem as fully explored and record the result in one commit
+        current_iteration['fully_explored'] = True
+        store.commit(current_iteration)
+        return False
+
+    # Record the result and append the new iteration in a single commit
+    if result_committed:
+        store.commit(next_iteration(current_iteration, new_params))
+    else:
+        store.commit(current_iteration, next_iteration(current_iteration, new_params))
+    return True
+
+
+def record_results(store, results):
+    """
+    Record the results of a batch of evaluations in one commit.
+
+    results is a list of (params, value) pairs, typically the states returned
+    by next_batch once they have been measured. The first result takes the
+    place of the pending iteration, which was the suggestion shown before the
+    batch was requested; the others are appended after it. Afterwards the
+    last iteration holds a measured result, which is what next_parameters and
+    next_batch expect.
+    """
+    if not results:
+        return
+    pending = store.iterations[-1]
+    params, value = results[0]
+    first = next_iteration(pending, params, value)
+    first['iteration_count'] = pending['iteration_count']
+    first['calculated_states'] = pending['calculated_states']
+    recorded = [first]
+    for params, value in results[1:]:
+        recorded.append(next_iteration(recorded[-1], params, value))
+    store.commit(*recorded)
@@ -0,0 +1,142 @@
+import atexit
+import json
+import os
+from app.utils.problem_store import ProblemStore, commit_listeners, is_problem_file, iteration_utility
+from app.utils.profiling import profiled
+
+INDEX_FILENAME = ".library.index"
+
+
+class ProblemIndex:
+    """
+    Manifest of the problems library, kept in problems/.library.index.
+
+    Each problem file has an entry with the mtime and size it had when it
+    was summarised, plus its title, iteration count, best value and explored
+    flag. Listing the library only stats the files; a problem is parsed again
+    only when its file changed behind the index's back, since commits made
+    through a ProblemStore update the entry in place. Those updates are only
+    written out by the next refresh, or when the process exits, so a commit
+    costs no rewrite of the whole manifest.
+    """
+
+    def __init__(self, problems_dir):
+        self.problems_dir = problems_dir
+        self.path = os.path.join(problems_dir, INDEX_FILENAME)
+        self.entries = {}
+        # Entries updated by commits since the manifest was last written
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as file:
+                self.entries = json.load(file)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        os.makedirs(self.problems_dir, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(self.entries, file)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+    def flush(self):
+        if self.dirty:
+            self.save()
+
+    @profiled()
+    def refresh(self):
+        """ Return the summary of every problem, re-reading only new or changed files """
+        if not os.path.exists(self.problems_dir):
+            os.makedirs(self.problems_dir)
+        changed = False
+        summaries = []
+        seen = set()
+        for filename in os.listdir(self.problems_dir):
+            if not is_problem_file(filename):
+                continue
+            filepath = os.path.join(self.problems_dir, filename)
+            stat = os.stat(filepath)
+            seen.add(filename)
+            entry = self.entries.get(filename)
+            if entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                entry = summarize(ProblemStore(filepath).iterations, stat)
+                self.entries[filename] = entry
+                changed = True
+            if entry['title'] is not None:
+                summaries.append(dict(entry, path=filepath))
+        for filename in list(self.entries):
+            if filename not in seen:
+                del self.entries[filename]
+                changed = True
+        if changed or self.dirty:
+            self.save()
+        return summaries
+
+    def record(self, store, previous_size):
+        filename = os.path.basename(store.path)
+        stat = os.stat(store.path)
+        entry = self.entries.get(filename)
+        if entry is not None and previous_size is not None and entry['size'] == previous_size:
+            # The entry was current before this commit, so only the new iterations are folded in
+            self.entries[filename] = summarize(store.iterations, stat, entry)
+        else:
+            self.entries[filename] = summarize(store.iterations, stat)
+        self.dirty = True
+
+
+def summarize(iterations, stat, entry=None):
+    if entry is None:
+        entry = {"title": None, "iteration_count": 0, "best_value": None, "fully_explored": False, "finalized_count": 0}
+    else:
+        entry = dict(entry)
+    entry['mtime_ns'] = stat.st_mtime_ns
+    entry['size'] = stat.st_size
+    if not iterations:
+        return entry
+    last = iterations[-1]
+    minimize = last.get('objective') == "Minimize"
+    # The last iteration is still waiting for its result unless the problem is finished
+    finalized_count = len(iterations) if last.get('fully_explored') else len(iterations) - 1
+    best = entry['best_value']
+    for iteration in iterations[entry['finalized_count']:finalized_count]:
+        value = iteration_utility(iteration)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if best is None or (value < best if minimize else value > best):
+                best = value
+    entry.update({
+        "title": last['title'],
+        "iteration_count": last.get('iteration_count', len(iterations) - 1),
+        "best_value": best,
+        "fully_explored": bool(last.get('fully_explored')),
+        "finalized_count": max(finalized_count, entry['finalized_count']),
+    })
+    return entry
+
+
+_indexes = {}
+
+
+def get_problem_index(problems_dir):
+    key = os.path.abspath(problems_dir)
+    index = _indexes.get(key)
+    if index is None:
+        index = ProblemIndex(problems_dir)
+        _indexes[key] = index
+    return index
+
+
+def _record_commit(store, previous_size):
+    get_problem_index(os.path.dirname(store.path) or ".").record(store, previous_size)
+
+
+def _flush_indexes():
+    for index in _indexes.values():
+        index.flush()
+
+
+commit_listeners.append(_record_commit)
+atexit.register(_flush_indexes)
@@ -0,0 +1,53 @@
+from app.utils.domains import variable_value
+from app.utils.state_codec import StateCodec
+
+
+class ProblemSchema:
+    """
+    The variables of a problem, compiled once from its JSON definition.
+
+    Names, types and domains are laid out by position, with a name -> index
+    map, so algorithms look variables up in O(1) instead of
+    searching the list of variable dicts. Every iteration of a problem lists
+    its variables in the same order, so position i of any iteration's
+    variables is variable i of the schema. Lock flags are not part of the
+    schema: the user can change them between iterations, so they are read
+    from the iteration at hand.
+    """
+
+    __slots__ = ('names', 'index', 'types', 'domains', 'radices', 'codec')
+
+    def __init__(self, variables):
+        self.codec = StateCodec(variables)
+        self.names = self.codec.names
+        self.index = self.codec.index
+        self.types = self.codec.types
+        self.domains = self.codec.domains
+        self.radices = self.codec.radices
+
+    def __len__(self):
+        return len(self.names)
+
+    def values(self, iteration):
+        return [variable_value(var) for var in iteration['variables']]
+
+    def locked_values(self, iteration):
+        return [bool(var.get('lock_value')) for var in iteration['variables']]
+
+    def locked_digits(self, iteration):
+        """ Position -> digit of every variable whose value is locked in iteration """
+        return {i: self.codec.digit(i, variable_value(var)) for i, var in enumerate(iteration['variables']) if var.get('lock_value')}
+
+    def positions_of_type(self, var_type):
+        return [i for i, t in enumerate(self.types) if t == var_type]
+
+
+def problem_schema(store):
+    """ Return the schema of a stored problem, compiled on first use and kept until the store is reloaded """
+    schema = store.indexes.get('schema')
+    if schema is None:
+        if not store.iterations:
+            return ProblemSchema([])
+        schema = ProblemSchema(store.iterations[0]['variables'])
+        store.indexes['schema'] = schema
+    return schema
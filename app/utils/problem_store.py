@@ -0,0 +1,208 @@
+import json
+import os
+from app.utils.profiling import count, profiled
+
+PROBLEMS_DIR = "problems"
+LOG_EXTENSION = ".jsonl"
+LEGACY_EXTENSION = ".json"
+
+
+def problem_filename(title, problems_dir=PROBLEMS_DIR):
+    return os.path.join(problems_dir, f"{title.replace(' ', '_')}{LOG_EXTENSION}")
+
+
+def problem_exists(title, problems_dir=PROBLEMS_DIR):
+    base = os.path.join(problems_dir, title.replace(' ', '_'))
+    return os.path.exists(base + LOG_EXTENSION) or os.path.exists(base + LEGACY_EXTENSION)
+
+
+def is_problem_file(filename):
+    return filename.endswith(LOG_EXTENSION) or filename.endswith(LEGACY_EXTENSION)
+
+
+# Callables notified after every commit with the store and its file size before the commit
+commit_listeners = []
+
+
+def iteration_utility(iteration):
+    # Simulated runs record the measured value under utility_measure
+    if 'optimized_variable' in iteration:
+        return iteration['optimized_variable']['value']
+    return iteration['utility_measure']['value']
+
+
+class ProblemStore:
+    """
+    Append-only log of the iterations of one problem.
+
+    Every line of the log is one iteration serialised as JSON. A line whose
+    iteration_count equals the one of the line before it amends that
+    iteration, so recording a result never rewrites earlier bytes. A commit
+    is one buffered write followed by an fsync; an unterminated last line
+    left behind by a crash is ignored on load and cut off by the next
+    commit. A line that cannot be read anywhere else means the log is
+    corrupt, and loading it raises a ValueError instead of dropping what
+    follows.
+
+    Problem files written by older versions (a single JSON list) are read
+    as they are and converted to a log the first time they are committed to.
+
+    indexes holds structures derived from the history (such as the tested
+    state set) that are kept up to date incrementally; they are dropped
+    whenever the history has to be reloaded from scratch.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.iterations = []
+        self.indexes = {}
+        self.legacy = False
+        self._size = 0
+        self._stat = None
+        self.load()
+
+    @profiled()
+    def load(self):
+        self.iterations = []
+        self.indexes = {}
+        self.legacy = False
+        self._size = 0
+        self._stat = None
+        if not os.path.exists(self.path):
+            return self.iterations
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        if content.lstrip()[:1] == b'[':
+            self.iterations = json.loads(content)
+            self.legacy = True
+            self._size = len(content)
+        else:
+            self._read_lines(content, 0)
+        self._stat = self._current_stat()
+        return self.iterations
+
+    @profiled()
+    def refresh(self):
+        # Pick up iterations appended by another process; only the new tail is parsed
+        stat = self._current_stat()
+        if stat == self._stat:
+            return self.iterations
+        if self.legacy or stat is None or self._stat is None or stat[0] != self._stat[0] or stat[2] < self._size:
+            return self.load()
+        with open(self.path, 'rb') as file:
+            file.seek(self._size)
+            self._read_lines(file.read(), self._size)
+        self._stat = stat
+        return self.iterations
+
+    @profiled()
+    def commit(self, *iterations):
+        """ Append (or amend the last of) the given iterations in a single write """
+        if not iterations:
+            return
+        if self.legacy:
+            self._migrate(iterations)
+            return
+        payload = b''.join(self._encode(iteration) for iteration in iterations)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'ab') as file:
+            # Appends made by other processes since the last refresh are read, not overwritten
+            end = file.tell()
+            if end < self._size:
+                self.load()
+            elif end > self._size:
+                with open(self.path, 'rb') as reader:
+                    reader.seek(self._size)
+                    self._read_lines(reader.read(end - self._size), self._size)
+            if end > self._size:
+                # Only a torn line left over from an interrupted commit is left past the last full line
+                file.truncate(self._size)
+            previous_size = self._size
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        self._size += len(payload)
+        count("ProblemStore.bytes_written", len(payload))
+        for iteration in iterations:
+            self._apply(iteration)
+        self._stat = self._current_stat()
+        for listener in commit_listeners:
+            listener(self, previous_size)
+
+    def _migrate(self, iterations):
+        for iteration in iterations:
+            self._apply(iteration)
+        old_path = self.path
+        base, extension = os.path.splitext(old_path)
+        new_path = base + LOG_EXTENSION if extension == LEGACY_EXTENSION else old_path
+        payload = b''.join(self._encode(iteration) for iteration in self.iterations)
+        temp_path = new_path + ".tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, new_path)
+        if new_path != old_path:
+            os.remove(old_path)
+            _stores[os.path.abspath(new_path)] = self
+        self.path = new_path
+        self.legacy = False
+        self._size = len(payload)
+        self._stat = self._current_stat()
+        for listener in commit_listeners:
+            listener(self, None)
+
+    def _read_lines(self, content, offset):
+        position = 0
+        while position < len(content):
+            end = content.find(b'\n', position)
+            if end == -1:
+                # An unterminated last line is a commit that was cut short
+                break
+            line = content[position:end]
+            if line.strip():
+                try:
+                    iteration = json.loads(line)
+                except ValueError:
+                    raise ValueError(f"{self.path}: unreadable line at byte {offset + position}") from None
+                self._apply(iteration)
+            position = end + 1
+        self._size = offset + position
+
+    def _apply(self, iteration):
+        if self.iterations and self.iterations[-1].get('iteration_count') == iteration.get('iteration_count'):
+            if self.iterations[-1] is not iteration:
+                self.iterations[-1] = iteration
+        else:
+            self.iterations.append(iteration)
+
+    def _encode(self, iteration):
+        return json.dumps(iteration, separators=(',', ':')).encode('utf-8') + b'\n'
+
+    def _current_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+_stores = {}
+
+
+def get_store(path):
+    """ Return the cached store for a problem file, re-reading it only if it changed on disk """
+    key = os.path.abspath(path)
+    store = _stores.get(key)
+    if store is None:
+        store = ProblemStore(path)
+        _stores[key] = store
+    else:
+        store.refresh()
+    return store
+
+
+def load_history(filename):
+    return get_store(filename).iterations
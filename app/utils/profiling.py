@@ -0,0 +1,130 @@
+"""
+Opt-in timers and counters around the application's hot paths.
+
+Profiling is off unless the LIFEOPT_PROFILE environment variable is set (or
+enable() is called, e.g. by main.py --profile). While it is off, profiled
+functions and timers cost a single flag check. When it is on, every timed
+call is recorded and, on exit, the per-name statistics (count, total, mean,
+p50, p95, max) and the counters are written as JSON to the path in
+LIFEOPT_PROFILE, or to profile_stats.json when it is just "1". Setting
+LIFEOPT_PROFILE_CPROFILE to a path also captures a cProfile of the main
+thread, readable with pstats or snakeviz.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_STATS_PATH = "profile_stats.json"
+
+_enabled = False
+_stats_path = None
+_profiler = None
+_timings = {}
+_counters = {}
+_lock = threading.Lock()
+
+
+def enable(stats_path=None, cprofile_path=None):
+    """ Start recording; the statistics are written to stats_path when the process exits """
+    global _enabled, _stats_path, _profiler
+    if _enabled:
+        return
+    _enabled = True
+    _stats_path = stats_path or DEFAULT_STATS_PATH
+    if cprofile_path:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+        atexit.register(_dump_cprofile, cprofile_path)
+    atexit.register(write_stats)
+
+
+def is_enabled():
+    return _enabled
+
+
+def record(name, seconds):
+    with _lock:
+        _timings.setdefault(name, []).append(seconds)
+
+
+def count(name, amount=1):
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+@contextmanager
+def timer(name):
+    if not _enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def profiled(name=None):
+    """ Decorator timing every call of the function under name (its qualified name by default) """
+    def decorate(function):
+        label = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(label, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summary():
+    with _lock:
+        timings = {name: sorted(values) for name, values in _timings.items()}
+        counters = dict(_counters)
+    return {
+        "timings": {
+            name: {
+                "count": len(values),
+                "total": sum(values),
+                "mean": sum(values) / len(values),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "max": values[-1],
+            }
+            for name, values in sorted(timings.items())
+        },
+        "counters": counters,
+    }
+
+
+def write_stats(path=None):
+    path = path or _stats_path or DEFAULT_STATS_PATH
+    with open(path, 'w') as file:
+        json.dump(summary(), file, indent=4)
+
+
+def _dump_cprofile(path):
+    _profiler.disable()
+    _profiler.dump_stats(path)
+
+
+_setting = os.environ.get("LIFEOPT_PROFILE")
+if _setting:
+    enable(None if _setting == "1" else _setting, os.environ.get("LIFEOPT_PROFILE_CPROFILE"))
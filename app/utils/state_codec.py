@@ -0,0 +1,102 @@
+from app.utils.domains import canonical_value, variable_domain, variable_type, variable_value
+
+
+class StateCodec:
+    """
+    Maps the states of a problem to mixed-radix integers and back.
+
+    Each variable is one digit: Booleans are bits (False = 0, True = 1),
+    Categorical values are their index in possible_values and Numerical
+    values are their offset from the minimum in steps. Codes are plain
+    Python integers, so they are exact for any number of variables and
+    can be hashed, compared and stored without building dicts.
+    """
+
+    __slots__ = ('names', 'types', 'domains', 'radices', 'index', 'places', 'size', '_lookups')
+
+    def __init__(self, variables):
+        self.names = [var['name'] for var in variables]
+        self.types = [variable_type(var) for var in variables]
+        self.domains = [variable_domain(var) for var in variables]
+        self.radices = [len(domain) for domain in self.domains]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.places = []
+        place = 1
+        for radix in self.radices:
+            self.places.append(place)
+            place *= radix
+        self.size = place
+        # Categorical lookups are interned once; ranges answer index() in O(1)
+        self._lookups = [
+            {value: digit for digit, value in enumerate(domain)} if isinstance(domain, list) else None
+            for domain in self.domains
+        ]
+
+    def digit(self, i, value):
+        value = canonical_value(value, self.types[i])
+        lookup = self._lookups[i]
+        if lookup is None:
+            return self.domains[i].index(value)
+        try:
+            return lookup[value]
+        except KeyError:
+            raise ValueError(f"{value!r} is not a possible value of {self.names[i]}") from None
+
+    def encode(self, state):
+        """ Encode a name -> value dict or an iteration's list of variables """
+        if isinstance(state, list):
+            state = {var['name']: variable_value(var) for var in state}
+        return sum(self.digit(i, state[name]) * self.places[i] for i, name in enumerate(self.names))
+
+    def encode_digits(self, digits):
+        return sum(digit * place for digit, place in zip(digits, self.places))
+
+    def digits(self, code):
+        result = []
+        for radix in self.radices:
+            code, digit = divmod(code, radix)
+            result.append(digit)
+        return result
+
+    def decode(self, code):
+        return {name: self.domains[i][digit] for i, (name, digit) in enumerate(zip(self.names, self.digits(code)))}
+
+    def value_at(self, code, i):
+        return self.domains[i][(code // self.places[i]) % self.radices[i]]
+
+    def digit_at(self, code, i):
+        return (code // self.places[i]) % self.radices[i]
+
+    def with_digit(self, code, i, digit):
+        return code + (digit - self.digit_at(code, i)) * self.places[i]
+
+    def neighbours(self, code, i=None):
+        """ Codes that differ from code in exactly one variable (or only in variable i) """
+        indices = range(len(self.names)) if i is None else (i,)
+        for i in indices:
+            current = self.digit_at(code, i)
+            if self.types[i] == 'Numerical':
+                candidates = [d for d in (current - 1, current + 1) if 0 <= d < self.radices[i]]
+            else:
+                candidates = [d for d in range(self.radices[i]) if d != current]
+            for digit in candidates:
+                yield code + (digit - current) * self.places[i]
+
+    def fits_int64(self):
+        return self.size <= 2 ** 63
+
+    def encode_batch(self, digit_rows):
+        """ Encode a (batch, variables) array of digits; returns an int64 array when the codes fit """
+        import numpy as np
+        digit_rows = np.asarray(digit_rows, dtype=np.int64)
+        if self.fits_int64():
+            return digit_rows @ np.asarray(self.places, dtype=np.int64)
+        return [self.encode_digits(row) for row in digit_rows.tolist()]
+
+    def decode_batch(self, codes):
+        """ Decode many codes at once into a (batch, variables) array of digits """
+        import numpy as np
+        if self.fits_int64():
+            codes = np.asarray(codes, dtype=np.int64)
+            return (codes[:, None] // np.asarray(self.places, dtype=np.int64)) % np.asarray(self.radices, dtype=np.int64)
+        return np.array([self.digits(int(code)) for code in codes], dtype=np.int64)
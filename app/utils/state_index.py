@@ -0,0 +1,159 @@
+import math
+import random
+from app.utils.domains import variable_value
+from app.utils.problem_schema import problem_schema
+
+
+class TestedStateIndex:
+    """
+    Hash set of every state recorded in a problem's history.
+
+    States are keyed by their StateCodec code, so membership checks are O(1)
+    regardless of the history length. The last iteration is still being
+    edited until its result is submitted, so its code is recomputed on every
+    update while earlier iterations are encoded once.
+    """
+
+    def __init__(self, codec):
+        self.codec = codec
+        self.keys = set()
+        self.indexed_count = 0
+        self.pending_key = None
+
+    def state_key(self, state):
+        # Accepts a code, a name -> value dict or an iteration's list of variables
+        return state if isinstance(state, int) else self.codec.encode(state)
+
+    def update(self, iterations):
+        if len(iterations) < self.indexed_count:
+            self.keys.clear()
+            self.indexed_count = 0
+        for iteration in iterations[self.indexed_count:len(iterations) - 1]:
+            self.keys.add(self.iteration_key(iteration))
+        self.indexed_count = max(self.indexed_count, len(iterations) - 1)
+        self.pending_key = self.iteration_key(iterations[-1]) if iterations else None
+        return self
+
+    def iteration_key(self, iteration):
+        return self.state_key(iteration['variables'])
+
+    def __contains__(self, state):
+        key = self.state_key(state)
+        return key == self.pending_key or key in self.keys
+
+    def untested(self, locked=None, exclude=(), attempts=100, rng=random):
+        """
+        The code of a state that is neither tested nor in exclude and keeps the
+        locked positions (position -> digit) at their digits, or None once
+        there is no such state. A few random draws are tried first; after that
+        the states are walked in code order, and since at most
+        len(keys) + len(exclude) + 1 of them can be taken, that many + 1 are
+        enough to find a free one however large the space is.
+        """
+        codec = self.codec
+        locked = locked or {}
+        base = sum(digit * codec.places[i] for i, digit in locked.items())
+        free = [i for i in range(len(codec.radices)) if i not in locked]
+        free_size = math.prod(codec.radices[i] for i in free)
+
+        def code_at(rank):
+            code = base
+            for i in free:
+                rank, digit = divmod(rank, codec.radices[i])
+                code += digit * codec.places[i]
+            return code
+
+        for _ in range(attempts):
+            code = code_at(rng.randrange(free_size))
+            if code not in self and code not in exclude:
+                return code
+        for rank in range(min(free_size, len(self.keys) + len(exclude) + 2)):
+            code = code_at(rank)
+            if code not in self and code not in exclude:
+                return code
+        return None
+
+
+def tested_state_index(store):
+    """ Return the store's tested-state index, encoding only iterations added since the last call """
+    index = store.indexes.get('tested_states')
+    if index is None:
+        index = TestedStateIndex(problem_schema(store).codec)
+        if not store.iterations:
+            return index
+        store.indexes['tested_states'] = index
+    return index.update(store.iterations)
+
+
+class ArrangementIndex(TestedStateIndex):
+    """
+    Tested-state index for problems whose states pick and arrange variables.
+
+    A state is keyed by the (position, digit) pairs of the variables it uses,
+    in the order it uses them: the variables numbered by their order field
+    when order matters or only num_vars_per_state of them are used, and all
+    of them otherwise (see iterations.state_orders).
+    """
+
+    def state_key(self, state):
+        return state
+
+    def iteration_key(self, iteration):
+        variables = iteration['variables']
+        if iteration['order_matters'] == "Yes" or iteration['num_vars_per_state'] < len(variables):
+            chosen = [i for _, i in sorted((var['order'], i) for i, var in enumerate(variables) if var['order'] > 0)]
+        else:
+            chosen = range(len(variables))
+        return tuple((i, self.codec.digit(i, variable_value(variables[i]))) for i in chosen)
+
+
+def arrangement_index(store):
+    """ Return the store's arrangement index, keying only iterations added since the last call """
+    index = store.indexes.get('arrangements')
+    if index is None:
+        index = ArrangementIndex(problem_schema(store).codec)
+        if not store.iterations:
+            return index
+        store.indexes['arrangements'] = index
+    return index.update(store.iterations)
+
+
+class BestStateIndex:
+    """
+    Best iteration of a problem's history that is not fully explored.
+
+    Like TestedStateIndex, finished iterations are scanned once and the last
+    one, still being edited, is compared again on every update, so finding
+    the best state no longer walks the whole history.
+    """
+
+    def __init__(self):
+        self.best = None
+        self.best_finished = None
+        self.indexed_count = 0
+
+    def update(self, iterations):
+        if len(iterations) < self.indexed_count:
+            self.best_finished = None
+            self.indexed_count = 0
+        for iteration in iterations[self.indexed_count:len(iterations) - 1]:
+            if self.better(iteration, self.best_finished):
+                self.best_finished = iteration
+        self.indexed_count = max(self.indexed_count, len(iterations) - 1)
+        # Ties keep the earlier iteration, as max() over the history did
+        self.best = iterations[-1] if iterations and self.better(iterations[-1], self.best_finished) else self.best_finished
+        return self
+
+    def better(self, iteration, best):
+        if iteration['fully_explored']:
+            return False
+        return best is None or iteration['optimized_variable']['value'] > best['optimized_variable']['value']
+
+
+def best_state_index(store):
+    """ Return the store's best-state index, scanning only iterations added since the last call """
+    index = store.indexes.get('best_state')
+    if index is None:
+        index = BestStateIndex()
+        store.indexes['best_state'] = index
+    return index.update(store.iterations)
@@ -1,5 +1,14 @@
+import argparse
+from app.utils import profiling
 from app.app import OptimizationApp
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", nargs="?", const=profiling.DEFAULT_STATS_PATH, help="write timing statistics to this file on exit")
+    parser.add_argument("--cprofile", help="also write a cProfile capture of the main thread to this file")
+    # Anything else is left for Qt
+    args, _ = parser.parse_known_args()
+    if args.profile or args.cprofile:
+        profiling.enable(args.profile, args.cprofile)
     app = OptimizationApp()
-    app.start()
\ No newline at end of file
+    app.start()
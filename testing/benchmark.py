@@ -0,0 +1,262 @@
+"""
+Measure how the optimization algorithms scale with the size of a problem.
+
+Three sweeps are run, each varying one axis while the other two stay at
+their baseline: the number of variables, the size of every variable's
+domain and the length of the history the algorithm has to read. For every
+(axis value x algorithm) cell a synthetic problem file is generated from a
+seed, then a fresh process opens it, asks for a first suggestion (cold:
+loading the history and building every index included) and goes through a
+few more observe/suggest steps (warm). Recorded per cell:
+
+    cold_seconds, suggest_p50/max, observe_p50   latency in seconds
+    peak_rss_mb, rss_growth_mb                  peak memory of the process
+    bytes_read, bytes_written                   file I/O of the measured part
+    log_bytes, side_file_bytes                  size of the problem and side files
+
+Cells run one at a time so that their timings do not disturb each other,
+each in a process of its own so that its peak memory is its own; a cell
+that overruns --timeout or fails is recorded with its error instead.
+Results go to <output-dir>/benchmark.json.
+
+Run from the repository root, e.g.
+
+    python -m testing.benchmark --variables 10 100 1000 --histories 10 1000 100000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+from app.algorithms.session import OptimizationSession
+from app.utils import profiling
+from app.utils.iterations import EXPLORED_MESSAGE
+from testing.simulated_testing import ALGORITHMS, create_algorithm, save_data
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASELINE = {"variables": 20, "domain": 10, "history": 100}
+
+
+def rss_mb():
+    """ Peak resident memory of this process so far, or None where it cannot be read """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def io_counters():
+    """ (bytes read, bytes written) by this process through read/write calls, where the OS reports them """
+    try:
+        with open("/proc/self/io", 'r') as file:
+            fields = dict(line.split(": ") for line in file.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except OSError:
+        return None
+
+
+def variable_definition(position, domain):
+    if domain == 2:
+        return {"name": f"v{position}", "type": "Boolean", "possible_values": [True, False]}
+    return {"name": f"v{position}", "type": "Numerical", "possible_values": {"min": 0, "max": domain - 1, "step": 1}}
+
+
+def utility(state):
+    # Smooth enough for the model-based algorithms to have something to learn
+    return float(sum((position % 3 - 1) * int(value) for position, value in enumerate(state.values())))
+
+
+def generate_history(filename, variables, domain, history, seed):
+    """ Write a problem log of history iterations over random states, as the app would have written it """
+    rng = np.random.default_rng(seed)
+    definitions = [variable_definition(position, domain) for position in range(variables)]
+    header = {
+        "title": os.path.splitext(os.path.basename(filename))[0],
+        "description": "",
+        "optimization_option": "Maximize",
+        "algorithm": "",
+        "objective": "",
+        "order_matters": "No",
+        "num_vars_per_state": variables,
+        "calculated_states": domain ** variables,
+        "fully_explored": False,
+    }
+    with open(filename, 'w') as file:
+        for count in range(1, history + 1):
+            digits = rng.integers(0, domain, size=variables).tolist()
+            values = [bool(digit) for digit in digits] if domain == 2 else digits
+            iteration = dict(header, iteration_count=count)
+            iteration["variables"] = [
+                dict(definition, current_value=value, order=position + 1, lock_order=False, lock_value=False, impact_score=0)
+                for position, (definition, value) in enumerate(zip(definitions, values))
+            ]
+            iteration["optimized_variable"] = {"name": "Utility", "value": utility(dict(zip(range(variables), values)))}
+            file.write(json.dumps(iteration, separators=(',', ':')) + "\n")
+
+
+def directory_size(path, exclude):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            full_path = os.path.join(root, name)
+            if full_path != exclude:
+                total += os.path.getsize(full_path)
+    return total
+
+
+def measure_cell(cell):
+    """ Run one cell; executed in a fresh process """
+    random.seed(cell['seed'])
+    np.random.seed(cell['seed'] % 2 ** 32)
+    if cell['profile']:
+        profiling.enable(cell['profile'])
+    baseline_rss = rss_mb()
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # Side files such as impacts are kept relative to the working directory
+        os.chdir(workdir)
+        try:
+            filename = os.path.join(workdir, "problems", os.path.basename(cell['history_file']))
+            os.makedirs(os.path.dirname(filename))
+            shutil.copyfile(cell['history_file'], filename)
+            title = os.path.splitext(os.path.basename(filename))[0]
+
+            io_before = io_counters()
+            started = time.perf_counter()
+            session = OptimizationSession(filename, title, create_algorithm(cell['algorithm'], cell['seed']))
+            state = session.suggest()
+            cold = time.perf_counter() - started
+
+            suggest_times, observe_times = [], []
+            for _ in range(cell['steps']):
+                if state == EXPLORED_MESSAGE:
+                    break
+                started = time.perf_counter()
+                session.observe(state, utility(state))
+                observe_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                state = session.suggest()
+                suggest_times.append(time.perf_counter() - started)
+            io_after = io_counters()
+
+            result = {
+                "cold_seconds": cold,
+                "suggest_p50": statistics.median(suggest_times) if suggest_times else None,
+                "suggest_max": max(suggest_times) if suggest_times else None,
+                "observe_p50": statistics.median(observe_times) if observe_times else None,
+                "steps": len(suggest_times),
+                "fully_explored": state == EXPLORED_MESSAGE,
+                "peak_rss_mb": rss_mb(),
+                "rss_growth_mb": rss_mb() - baseline_rss if baseline_rss is not None else None,
+                "bytes_read": io_after[0] - io_before[0] if io_before else None,
+                "bytes_written": io_after[1] - io_before[1] if io_before else None,
+                "log_bytes": os.path.getsize(filename),
+                "side_file_bytes": directory_size(workdir, filename),
+            }
+        finally:
+            os.chdir(previous_cwd)
+    return result
+
+
+def _cell_process(cell, results):
+    try:
+        results.put(measure_cell(cell))
+    except BaseException as e:
+        results.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_cell(cell, timeout):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_cell_process, args=(cell, results))
+    process.start()
+    try:
+        result = results.get(timeout=timeout)
+    except queue.Empty:
+        process.terminate()
+        result = {"error": f"timed out after {timeout} s"}
+    process.join()
+    return result
+
+
+def build_cells(args, output_dir):
+    """ One cell per (axis, value, algorithm); history files are generated once and shared by the algorithms """
+    sweeps = {"variables": args.variables, "domain": args.domains, "history": args.histories}
+    baseline = {"variables": args.baseline_variables, "domain": args.baseline_domain, "history": args.baseline_history}
+    history_dir = os.path.join(output_dir, "histories")
+    os.makedirs(history_dir, exist_ok=True)
+    if args.profile:
+        os.makedirs(os.path.join(output_dir, "profiles"), exist_ok=True)
+    cells = []
+    for axis, values in sweeps.items():
+        for value in values:
+            size = dict(baseline, **{axis: value})
+            seed = args.seed + 7919 * size['variables'] + 104729 * size['domain'] + size['history']
+            history_file = os.path.join(history_dir, f"bench_{size['variables']}v_{size['domain']}d_{size['history']}h.jsonl")
+            if not os.path.exists(history_file):
+                generate_history(history_file, size['variables'], size['domain'], size['history'], seed)
+            for algorithm in args.algorithms:
+                profile = os.path.join(output_dir, "profiles", f"{axis}_{value}_{algorithm}.json") if args.profile else None
+                cells.append(dict(size, axis=axis, value=value, algorithm=algorithm, seed=seed, steps=args.steps,
+                                  history_file=history_file, profile=profile))
+    return cells
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how the optimization algorithms scale with the size of a problem.")
+    parser.add_argument("--variables", type=int, nargs="*", default=[10, 30, 100, 300, 1000], help="variable counts to sweep")
+    parser.add_argument("--domains", type=int, nargs="*", default=[2, 10, 100, 1000], help="domain sizes to sweep (2 means Boolean variables)")
+    parser.add_argument("--histories", type=int, nargs="*", default=[10, 100, 1000, 10000, 100000], help="history lengths to sweep")
+    parser.add_argument("--baseline-variables", type=int, default=BASELINE["variables"])
+    parser.add_argument("--baseline-domain", type=int, default=BASELINE["domain"])
+    parser.add_argument("--baseline-history", type=int, default=BASELINE["history"])
+    parser.add_argument("--algorithms", nargs="+", choices=sorted(ALGORITHMS), default=list(ALGORITHMS))
+    parser.add_argument("--steps", type=int, default=5, help="warm observe/suggest steps after the first suggestion")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds after which a cell is abandoned")
+    parser.add_argument("--profile", action="store_true", help="also write the profiling statistics of every cell")
+    parser.add_argument("--output-dir", default="benchmark_results")
+    return parser.parse_args(argv)
+
+
+def format_seconds(seconds):
+    return f"{seconds * 1000:9.1f} ms" if seconds is not None else "        -   "
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    cells = build_cells(args, output_dir)
+    print(f"Running {len(cells)} cells")
+
+    results = []
+    for number, cell in enumerate(cells, start=1):
+        result = {key: cell[key] for key in ("axis", "value", "algorithm", "variables", "domain", "history", "seed")}
+        result.update(run_cell(cell, args.timeout))
+        results.append(result)
+        label = f"[{number}/{len(cells)}] {cell['axis']:>9} {cell['value']:>7} {cell['algorithm']:>22}"
+        if "error" in result:
+            print(f"{label}: {result['error']}")
+        else:
+            memory = f", peak {result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else ""
+            print(f"{label}: cold {format_seconds(result['cold_seconds'])}, warm {format_seconds(result['suggest_p50'])}{memory}")
+        # Written after every cell so that an interrupted run keeps what it measured
+        save_data({"baseline": {"variables": args.baseline_variables, "domain": args.baseline_domain, "history": args.baseline_history},
+                   "results": results}, os.path.join(output_dir, "benchmark.json"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import json
+import struct
+import numpy as np
+from app.utils.state_codec import StateCodec
+
+
+class Landscape:
+    """
+    A utility landscape stored as one float64 per state, indexed by state code.
+
+    The file is a small header (magic, header length and a JSON object with the
+    variable names) padded to 8 bytes, followed by the raw little-endian array.
+    Loading memory-maps the array read-only, so a lookup is a single index and
+    every benchmark worker shares the operating system's page cache instead of
+    holding its own copy.
+    """
+
+    MAGIC = b'LOLS\x01'
+    HEADER_LENGTH = struct.Struct('<I')
+
+    def __init__(self, names, utilities):
+        self.names = names
+        self.utilities = utilities
+        self.codec = StateCodec([{"name": name, "type": "Boolean"} for name in names])
+
+    def utility(self, state):
+        """ Utility of a name -> value dict, an iteration's variables or a state code """
+        code = state if isinstance(state, int) else self.codec.encode(state)
+        return float(self.utilities[code])
+
+    def max_utility(self):
+        return float(self.utilities.max())
+
+    def save(self, filename):
+        header = json.dumps({"names": self.names}).encode()
+        prefix = self.MAGIC + self.HEADER_LENGTH.pack(len(header)) + header
+        prefix += b'\0' * (-len(prefix) % 8)
+        with open(filename, 'wb') as file:
+            file.write(prefix)
+            file.write(np.ascontiguousarray(self.utilities, dtype='<f8').tobytes())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as file:
+            magic = file.read(len(cls.MAGIC))
+            if magic != cls.MAGIC:
+                raise ValueError(f"{filename} is not a landscape file")
+            (length,) = cls.HEADER_LENGTH.unpack(file.read(cls.HEADER_LENGTH.size))
+            header = json.loads(file.read(length))
+        offset = len(cls.MAGIC) + cls.HEADER_LENGTH.size + length
+        offset += -offset % 8
+        utilities = np.memmap(filename, dtype='<f8', mode='r', offset=offset, shape=(1 << len(header['names']),))
+        return cls(header['names'], utilities)
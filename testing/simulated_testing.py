@@ -1,11 +1,57 @@
+"""
+Benchmark the optimization algorithms on generated utility landscapes.
+
+Every (map size x iteration count x algorithm x seed) combination is a cell.
+Cells are independent, so they are spread over a process pool; each one gets
+its own seed, keeps its run in memory and writes its result file once when
+it is done. The results are then aggregated into a single summary.
+
+Run from the repository root, e.g.
+
+    python -m testing.simulated_testing --map-sizes 6 8 10 --iterations 10 50 100 --seeds 5
+"""
+import argparse
+import inspect
 import json
+import os
 import random
-import matplotlib.pyplot as plt
-from reinforcement_learning import ReinforcementLearning
-from hill_climbing import HillClimbing
-from algorythims.genetic_algo import GeneticAlgo
-from random_comparison import RandomComparison
-from test_generator import TestGenerator
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from app.algorithms.exhaustive_search import ExhaustiveSearch
+from app.algorithms.genetic_algo import GeneticAlgo
+from app.algorithms.hill_climbing import HillClimbingOptimization
+from app.algorithms.random_comparison import RandomComparison
+from app.algorithms.reinforcement_learning import ReinforcementLearning
+from app.algorithms.surrogate import SurrogateOptimization
+from app.algorithms.session import OptimizationSession
+from app.utils.iterations import EXPLORED_MESSAGE
+from app.utils.problem_store import ProblemStore
+from testing.landscape import Landscape
+from testing.test_generator import TestGenerator
+
+ALGORITHMS = {
+    "HillClimbing": HillClimbingOptimization,
+    "RandomComparison": RandomComparison,
+    "GeneticAlgo": GeneticAlgo,
+    "ReinforcementLearning": ReinforcementLearning,
+    "Surrogate": SurrogateOptimization,
+    "ExhaustiveSearch": ExhaustiveSearch,
+}
+
+
+def create_algorithm(name, seed):
+    """ A new instance of the named algorithm, given the seed when it has a generator of its own """
+    algorithm_class = ALGORITHMS[name]
+    if "seed" in inspect.signature(algorithm_class).parameters:
+        return algorithm_class(seed=seed)
+    return algorithm_class()
+
+
+# Landscapes loaded by this worker process, keyed by filename
+_landscapes = {}
+
 
 def load_data(filename):
     with open(filename, 'r') as file:
@@ -15,95 +61,191 @@ def save_data(data, filename):
     with open(filename, 'w') as file:
         json.dump(data, file, indent=4)
 
-def find_utility_value(variables, utility_data):
-    query_state = {var['name']: var['value'] == 'True' for var in variables}
-    for entry in utility_data:
-        if entry['state'] == query_state:
-            return entry['utility_value']
-    return None
-# just for json formatting
-def format_state_utility(title, description, utility_value, algorithm, variables, iteration_count):
+def find_utility_value(variables, landscape):
+    return landscape.utility(variables)
+
+# memory-mapped once per worker; the pages themselves are shared between workers
+def load_landscape(filename):
+    if filename not in _landscapes:
+        _landscapes[filename] = Landscape.load(filename)
+    return _landscapes[filename]
+
+# the first iteration of a simulated problem, in the same format the app writes
+def initial_iteration(title, initial_state, utility_value, algorithm, num_vars):
     return {
         "title": title,
-        "description": description,
-        "utility_measure": {
-            "name": "Utility",
-            "value": utility_value
-        },
-        "algorithm": convert_Algorithm_to_string(algorithm),
-        "variables": variables,
-        "iteration_count": iteration_count
+        "description": "",
+        "variables": [
+            {
+                "name": name,
+                "type": "Boolean",
+                "possible_values": [True, False],
+                "current_value": value,
+                "order": position + 1,
+                "lock_order": False,
+                "lock_value": False,
+                "impact_score": 0,
+            }
+            for position, (name, value) in enumerate(initial_state.items())
+        ],
+        "optimized_variable": {"name": "Utility", "value": utility_value},
+        "optimization_option": "Maximize",
+        "algorithm": algorithm,
+        "objective": "",
+        "order_matters": "No",
+        "num_vars_per_state": num_vars,
+        "iteration_count": 1,
+        "calculated_states": 2 ** num_vars,
+        "fully_explored": False,
     }
 
-# automatically generate test data and simulate the set of algorithms
-def simulate_algorithm_test(input_filename, paramaterMapSize, algorithms, num_iterations):
-    
-    utility_data = load_data(input_filename)
-    initial_state = random.choice(utility_data)
-    output_file_names = []
-
-    for algo in algorithms:
-        # this section mostly for saving initial state to have the algorithm start from a known state
-        output_file = f"test_output_{paramaterMapSize}_{convert_Algorithm_to_string(algo)}_{num_iterations}.json"
-        output_file_names.append(output_file)
-        test_results = []
-        formatted_test_utility_values = format_state_utility('', '', initial_state['utility_value'], algo, [{"name": key, "value": str(val), "type": "boolean"} for key, val in initial_state['state'].items()], 1)
-        test_results.append(formatted_test_utility_values)
-        save_data(test_results, output_file)
-        algo_instance = algo()
-
-        # Run the algorithm for the specified number of iterations
-        for i in range(1, num_iterations):
-            new_params = algo_instance.next_parameters(output_file)
-            new_variables = [{"name": name, "value": value, "type": "boolean"} for name, value in new_params.items()]
-            # if algo == ReinforcementLearning:
-            #     print(new_params)
-            utility_value = find_utility_value(new_variables, utility_data)
-
-            formatted_test_result = format_state_utility(
-                f"Test Iteration {i+1}",
-                "",
-                utility_value if utility_value is not None else 'Utility not found',
-                algo,
-                new_variables,
-                i+1
-            )
-            test_results.append(formatted_test_result)
-
-            save_data(test_results, output_file)  # This ensures data is saved at each step
-    return output_file_names
+# run one cell of the grid; executed in a worker process
+def run_cell(cell):
+    random.seed(cell['seed'])
+    np.random.seed(cell['seed'] % 2 ** 32)
+    landscape = load_landscape(cell['landscape'])
+    initial_state = landscape.codec.decode(cell['initial_state'])
+    title = f"sim_{cell['map_size']}_{cell['algorithm']}_{cell['iterations']}_{cell['repeat']}"
+    started = time.perf_counter()
+
+    # The algorithms keep their side files (impacts, Q-tables) relative to the problem,
+    # so every cell works in a scratch directory of its own
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            filename = os.path.join(workdir, "problems", f"{title}.jsonl")
+            os.makedirs(os.path.dirname(filename))
+            ProblemStore(filename).commit(initial_iteration(title, initial_state, find_utility_value(initial_state, landscape), cell['algorithm'], cell['map_size']))
+            session = OptimizationSession(filename, title, create_algorithm(cell['algorithm'], cell['seed']))
+            explored = False
+            for _ in range(1, cell['iterations']):
+                new_params = session.suggest()
+                if new_params == EXPLORED_MESSAGE:
+                    explored = True
+                    break
+                session.observe(new_params, find_utility_value(new_params, landscape))
+            utilities = [iteration['optimized_variable']['value'] for iteration in session.iterations]
+        finally:
+            os.chdir(previous_cwd)
+
+    result = {key: cell[key] for key in ("map_size", "iterations", "algorithm", "repeat", "seed")}
+    result.update({
+        "utilities": utilities,
+        "best_utility": max(utilities),
+        "landscape_max": landscape.max_utility(),
+        # Number of evaluations it took to reach the landscape's maximum, or None if the run never did
+        "evaluations_to_optimum": next((count for count, utility in enumerate(utilities, start=1) if utility >= landscape.max_utility()), None),
+        "fully_explored": explored,
+        "seconds": time.perf_counter() - started,
+    })
+    save_data(result, cell['output'])
+    return result
 
 
 def find_max_utility_value(data):
-    valid_values = [float(item['utility_measure']['value']) for item in data if isinstance(item['utility_measure']['value'], (int, float))]
+    valid_values = [float(item['optimized_variable']['value']) for item in data if isinstance(item['optimized_variable']['value'], (int, float))]
     return max(valid_values) if valid_values else None
 
 
-def convert_Algorithm_to_string(algorithm):
-    return str(algorithm).split('.')[1].split('\'')[0]
-
-paramMapNumber = [6, 8, 10]
-testedIterations = [10, 50, 100]
-testedAlgorithms = [HillClimbing, RandomComparison, GeneticAlgo, ReinforcementLearning]
-testGenerator = TestGenerator()
-variation = 20
-testFiles = []
-all_output_files = []  # This will store all output file names across all simulations
-for paramMap in paramMapNumber:
-    testGenerator.generate_full_data(paramMap, variation, "mock_data_" + str(paramMap) + ".json")
-    testFiles.append(["mock_data_" + str(paramMap) + ".json", str(paramMap)])
-# Ensure all data generation and saving is completed before attempting to load and analyze
-for testFile in testFiles:
-    fileName = testFile[0]
-    strparamMap = testFile[1]
-    for iteration in testedIterations:
-        outputFiles = simulate_algorithm_test(fileName, strparamMap, testedAlgorithms, iteration)
-        all_output_files.extend(outputFiles)  # Extend the cumulative list with new file names
-
-# # Now process and print the max utility value for each output file
-for outputFile in all_output_files:
-    try:
-        data = load_data(outputFile)
-        print(f"Max Utility Value in {outputFile}: {find_max_utility_value(data)}")
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
+def generate_landscapes(map_sizes, repeats, variation, base_seed, output_dir):
+    """ Generate one landscape per (map size, repeat) and pick its starting state; shared by every algorithm """
+    landscapes = {}
+    for map_size in map_sizes:
+        for repeat in range(repeats):
+            seed = base_seed + 7919 * map_size + repeat
+            np.random.seed(seed % 2 ** 32)
+            filename = os.path.join(output_dir, f"mock_data_{map_size}_{repeat}.landscape")
+            TestGenerator().generate_landscape_file(map_size, variation, filename)
+            landscapes[map_size, repeat] = (filename, random.Random(seed).randrange(1 << map_size))
+    return landscapes
+
+
+def build_cells(map_sizes, tested_iterations, algorithms, repeats, landscapes, base_seed, output_dir):
+    cells = []
+    for map_size in map_sizes:
+        for iterations in tested_iterations:
+            for algorithm in algorithms:
+                for repeat in range(repeats):
+                    landscape, initial_state = landscapes[map_size, repeat]
+                    cells.append({
+                        "map_size": map_size,
+                        "iterations": iterations,
+                        "algorithm": algorithm,
+                        "repeat": repeat,
+                        "seed": base_seed + len(cells),
+                        "landscape": landscape,
+                        "initial_state": initial_state,
+                        "output": os.path.join(output_dir, f"test_output_{map_size}_{algorithm}_{iterations}_{repeat}.json"),
+                    })
+    return cells
+
+
+def summarize(results):
+    """ Aggregate the cells of every (map size, iterations, algorithm) over their seeds """
+    groups = {}
+    for result in results:
+        groups.setdefault((result['map_size'], result['iterations'], result['algorithm']), []).append(result)
+    summary = []
+    for (map_size, iterations, algorithm), group in sorted(groups.items()):
+        best = [result['best_utility'] for result in group]
+        # Share of the landscape's maximum that the run reached
+        ratio = [result['best_utility'] / result['landscape_max'] for result in group]
+        reached = [result['evaluations_to_optimum'] for result in group if result['evaluations_to_optimum'] is not None]
+        summary.append({
+            "map_size": map_size,
+            "iterations": iterations,
+            "algorithm": algorithm,
+            "runs": len(group),
+            "mean_best_utility": float(np.mean(best)),
+            "std_best_utility": float(np.std(best)),
+            "mean_max_ratio": float(np.mean(ratio)),
+            "found_max": sum(result['best_utility'] >= result['landscape_max'] for result in group),
+            # Over the runs that found the maximum only
+            "mean_evaluations_to_optimum": float(np.mean(reached)) if reached else None,
+            "mean_seconds": float(np.mean([result['seconds'] for result in group])),
+        })
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the optimization algorithms on generated utility landscapes.")
+    parser.add_argument("--map-sizes", type=int, nargs="+", default=[6, 8, 10], help="number of Boolean variables of each landscape")
+    parser.add_argument("--iterations", type=int, nargs="+", default=[10, 50, 100], help="iteration budgets to test")
+    parser.add_argument("--algorithms", nargs="+", choices=sorted(ALGORITHMS), default=list(ALGORITHMS))
+    parser.add_argument("--seeds", type=int, default=1, help="landscapes and runs per grid point")
+    parser.add_argument("--seed", type=int, default=0, help="base seed; every cell derives its own from it")
+    parser.add_argument("--variation", type=float, default=20, help="roughness of the generated landscapes")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--output-dir", default="simulation_results")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    landscapes = generate_landscapes(args.map_sizes, args.seeds, args.variation, args.seed, output_dir)
+    cells = build_cells(args.map_sizes, args.iterations, args.algorithms, args.seeds, landscapes, args.seed, output_dir)
+    print(f"Running {len(cells)} cells")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(run_cell, cell): cell for cell in cells}
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"[{len(results)}/{len(cells)}] {os.path.basename(futures[future]['output'])}: max utility {result['best_utility']:.2f}")
+
+    summary = summarize(results)
+    save_data(summary, os.path.join(output_dir, "summary.json"))
+    for row in summary:
+        print(f"{row['algorithm']:>22} map {row['map_size']:>3} iterations {row['iterations']:>4}: "
+              f"best {row['mean_best_utility']:.2f} +/- {row['std_best_utility']:.2f}, "
+              f"{row['mean_max_ratio']:.1%} of max, max found {row['found_max']}/{row['runs']}"
+              + (f" after {row['mean_evaluations_to_optimum']:.1f} evaluations" if row['mean_evaluations_to_optimum'] is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
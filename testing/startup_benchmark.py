@@ -0,0 +1,106 @@
+"""
+Measure the GUI's time to first window.
+
+Every run starts a fresh interpreter that builds the OptimizationApp and
+shows the problem definition page, then reports as soon as the event loop
+is running. The time is taken from launching the process to that report,
+so interpreter start, imports, the stylesheet and page construction are all
+included. The child also lists the modules it had loaded by then: numpy
+and the algorithm modules are supposed to wait until an optimization runs.
+
+Run from the repository root, e.g.
+
+    python -m testing.startup_benchmark --runs 10 --budget 1500
+
+The results are written to startup_results.json; the exit status is 1 when
+the median exceeds --budget or a deferred module was loaded at startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules that must not be needed to show the first window
+DEFERRED_MODULES = ("numpy", "app.iterative_optimization", "app.algorithms.genetic_algo", "app.algorithms.hill_climbing",
+                    "app.algorithms.reinforcement_learning", "app.algorithms.surrogate", "app.algorithms.exhaustive_search",
+                    "app.algorithms.random_comparison")
+
+CHILD = """
+import json, sys
+from PyQt5.QtCore import QTimer
+from app.app import OptimizationApp
+
+app = OptimizationApp()
+app.start_problem_definition()
+
+def ready():
+    deferred = %r
+    print(json.dumps({"loaded": [name for name in deferred if name in sys.modules], "modules": len(sys.modules)}), flush=True)
+    app.app.quit()
+
+QTimer.singleShot(0, ready)
+app.app.exec_()
+""" % (DEFERRED_MODULES,)
+
+
+def measure(repository, platform):
+    environment = dict(os.environ, PYTHONPATH=repository)
+    if platform:
+        environment["QT_QPA_PLATFORM"] = platform
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", CHILD], cwd=repository, env=environment,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    elapsed = time.perf_counter() - started
+    _, errors = process.communicate()
+    if not line:
+        raise RuntimeError(f"The application did not start:\n{errors}")
+    return dict(json.loads(line), seconds=elapsed)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the GUI's time to first window.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None, help="milliseconds the median may take")
+    parser.add_argument("--platform", default="offscreen", help="Qt platform plugin; empty for the default one")
+    parser.add_argument("--output", default="startup_results.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # The first run warms the disk cache and is not counted
+    measure(repository, args.platform)
+    runs = [measure(repository, args.platform) for _ in range(args.runs)]
+    seconds = [run['seconds'] for run in runs]
+    loaded = sorted({name for run in runs for name in run['loaded']})
+    result = {
+        "runs": len(runs),
+        "median_ms": statistics.median(seconds) * 1000,
+        "min_ms": min(seconds) * 1000,
+        "max_ms": max(seconds) * 1000,
+        "modules": runs[-1]['modules'],
+        "deferred_modules_loaded": loaded,
+        "budget_ms": args.budget,
+    }
+    # Kept free of numpy imports
+    with open(args.output, 'w') as file:
+        json.dump(result, file, indent=4)
+    print(f"Time to first window: median {result['median_ms']:.0f} ms (min {result['min_ms']:.0f}, max {result['max_ms']:.0f}), "
+          f"{result['modules']} modules loaded")
+    failed = False
+    if loaded:
+        print(f"Loaded at startup although they should be deferred: {', '.join(loaded)}")
+        failed = True
+    if args.budget is not None and result['median_ms'] > args.budget:
+        print(f"Over the budget of {args.budget:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import numpy as np
 import json
+from testing.landscape import Landscape
 
 class TestGenerator:
     # this is the seed value
@@ -37,6 +38,40 @@ class TestGenerator:
                         utility_values[neighbor] = np.clip(average_utility + random_variation, 1, 100)
                         states_to_process.append(neighbor)
 
+    def generate_landscape(self, num_params, variation_range):
+        """
+        Vectorised equivalent of initialize_state + generate_utility_values.
+
+        States are integer codes whose bit i is the value of Var_{i+1}, so the
+        neighbours of a state are its codes XOR a single bit. Every state at
+        Hamming distance d from the initial state is reached through its d
+        neighbours at distance d - 1, all of which are defined by then, so the
+        breadth-first walk collapses to one batched step per level: the mean
+        of those neighbours plus Gaussian noise of scale variation / (1 + d).
+        Returns the initial code and a float array of utilities indexed by code.
+        """
+        size = 1 << num_params
+        initial_code = int(np.random.randint(size))
+        offsets = np.arange(size, dtype=np.int64)
+        levels = np.zeros(size, dtype=np.int64)
+        for bit in range(num_params):
+            levels += (offsets >> bit) & 1
+        # offsets grouped by Hamming distance from the initial state
+        by_level = np.split(offsets[np.argsort(levels, kind='stable')], np.cumsum(np.bincount(levels, minlength=num_params + 1))[:-1])
+
+        utilities = np.empty(size)
+        utilities[initial_code] = np.random.uniform(1, 100)
+        for level in range(1, num_params + 1):
+            level_offsets = by_level[level]
+            states = initial_code ^ level_offsets
+            total = np.zeros(len(states))
+            for bit in range(num_params):
+                flipped = ((level_offsets >> bit) & 1).astype(bool)
+                total[flipped] += utilities[states[flipped] ^ (1 << bit)]
+            scale = variation_range / (1 + level)
+            utilities[states] = np.clip(total / level + np.random.normal(0, scale, len(states)), 1, 100)
+        return initial_code, utilities
+
     def save_utilities_to_json(self,utility_values, num_params, filename):
         variable_names = [f"Var_{i+1}" for i in range(num_params)]
         data = []
@@ -58,6 +93,13 @@ class TestGenerator:
             json.dump(data, f, indent=4, sort_keys=False)
 
     def generate_full_data(self, num_params, variation_range, filename):
-        initial_state, utility_values = self.initialize_state(num_params)
-        self.generate_utility_values(initial_state, num_params, variation_range, utility_values)
-        self.save_utilities_to_json(utility_values, num_params, filename)
\ No newline at end of file
+        _, utilities = self.generate_landscape(num_params, variation_range)
+        utility_values = {tuple(bool((code >> i) & 1) for i in range(num_params)): value for code, value in enumerate(utilities.tolist())}
+        self.save_utilities_to_json(utility_values, num_params, filename)
+
+    def generate_landscape_file(self, num_params, variation_range, filename):
+        """ Generate a landscape and save it in the binary format that Landscape.load memory-maps """
+        _, utilities = self.generate_landscape(num_params, variation_range)
+        landscape = Landscape([f"Var_{i+1}" for i in range(num_params)], utilities)
+        landscape.save(filename)
+        return landscape
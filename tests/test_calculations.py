@@ -0,0 +1,40 @@
+import itertools
+import math
+import pytest
+from app.utils.calculations import calculate_number_of_possible_states, count_states
+
+
+def variable(name, var_type, possible_values, lock_value=False, lock_order=False):
+    return {"name": name, "type": var_type, "possible_values": possible_values, "lock_value": lock_value, "lock_order": lock_order}
+
+
+def brute_force(domain_sizes, num_vars, order_matters, free_order):
+    total = 0
+    for subset in itertools.combinations(range(len(domain_sizes)), num_vars):
+        arrangements = math.factorial(sum(free_order[i] for i in subset)) if order_matters else 1
+        total += math.prod(domain_sizes[i] for i in subset) * arrangements
+    return total
+
+
+@pytest.mark.parametrize("order_matters", [False, True])
+@pytest.mark.parametrize("num_vars", [0, 1, 2, 3, 4])
+def test_count_states_matches_enumeration(order_matters, num_vars):
+    domain_sizes = [2, 3, 1, 5]
+    free_order = [True, False, True, False]
+    assert count_states(domain_sizes, num_vars, order_matters, free_order) == brute_force(domain_sizes, num_vars, order_matters, free_order)
+
+
+def test_count_states_out_of_range():
+    assert count_states([2, 2], 3, False) == 0
+
+
+def test_locked_values_and_orders_are_counted_once():
+    variables = [
+        variable("a", "Boolean", [True, False], lock_value=True),
+        variable("b", "Numerical", {"min": 0, "max": 3, "step": 1}, lock_order=True),
+        variable("c", "Categorical", ["x", "y", "z"]),
+    ]
+    # a has a single value; with order mattering only c can move, so no state is arranged twice
+    assert calculate_number_of_possible_states(variables, 3, False) == 1 * 4 * 3
+    assert calculate_number_of_possible_states(variables, 3, True) == 1 * 4 * 3
+    assert calculate_number_of_possible_states(variables, 2, True) == brute_force([1, 4, 3], 2, True, [False, False, True])
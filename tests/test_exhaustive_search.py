@@ -0,0 +1,97 @@
+from app.algorithms.exhaustive_search import ExhaustiveSearch
+from app.utils.calculations import calculate_number_of_possible_states
+from app.utils.iterations import EXPLORED_MESSAGE, record_suggestion
+from app.utils.problem_store import ProblemStore, get_store
+
+
+def variable(name, var_type, possible_values, current_value):
+    return {"name": name, "type": var_type, "possible_values": possible_values, "current_value": current_value,
+            "order": 0, "lock_order": False, "lock_value": False, "impact_score": 0}
+
+
+def mixed_variables():
+    return [
+        variable("coffee", "Boolean", [True, False], True),
+        variable("sleep", "Numerical", {"min": 5, "max": 9, "step": 2}, 7),
+        variable("music", "Categorical", ["jazz", "rock", "none"], "rock"),
+    ]
+
+
+def create_problem(tmp_path, variables):
+    """ Write the first iteration of a problem as the problem definition page does """
+    path = str(tmp_path / "problems" / "problem.jsonl")
+    ProblemStore(path).commit({
+        "title": "Test problem",
+        "description": "",
+        "variables": variables,
+        "optimized_variable": {"name": "Utility", "value": 0},
+        "optimization_option": "Automatic Optimization",
+        "algorithm": "Test Every Combination",
+        "objective": "Maximize",
+        "order_matters": "No",
+        "num_vars_per_state": len(variables),
+        "iteration_count": 0,
+        "calculated_states": calculate_number_of_possible_states(variables, len(variables), False),
+        "fully_explored": False,
+    })
+    return path
+
+
+def run_to_the_end(path, search, limit=1000):
+    store = get_store(path)
+    suggestions = []
+    for _ in range(limit):
+        params = search.next_parameters(path)
+        if not record_suggestion(store, params):
+            return suggestions
+        suggestions.append(params)
+    raise AssertionError("the search did not finish")
+
+
+def test_every_state_is_suggested_once(tmp_path):
+    variables = mixed_variables()
+    path = create_problem(tmp_path, variables)
+    suggestions = run_to_the_end(path, ExhaustiveSearch())
+    states = {tuple(sorted(params.items())) for params in suggestions}
+    assert len(states) == len(suggestions)
+    # The initial state was tested before the search started
+    assert len(suggestions) == calculate_number_of_possible_states(variables, 3, False) - 1
+
+
+def test_locked_value_is_kept(tmp_path):
+    variables = mixed_variables()
+    variables[2]['lock_value'] = True
+    path = create_problem(tmp_path, variables)
+    suggestions = run_to_the_end(path, ExhaustiveSearch())
+    assert all(params['music'] == "rock" for params in suggestions)
+    assert len(suggestions) == calculate_number_of_possible_states(variables, 3, False) - 1
+
+
+def test_cursor_resumes_after_a_restart(tmp_path):
+    variables = mixed_variables()
+    path = create_problem(tmp_path, variables)
+    search = ExhaustiveSearch()
+    store = get_store(path)
+    for _ in range(4):
+        record_suggestion(store, search.next_parameters(path))
+
+    # An unrecorded suggestion is made again, so a new process picks up where the old one stopped
+    pending = search.next_parameters(path)
+    restarted = ExhaustiveSearch()
+    assert restarted.next_parameters(path) == pending
+    assert restarted.cursor == search.cursor
+
+
+def test_changing_a_lock_restarts_the_enumeration(tmp_path):
+    variables = mixed_variables()
+    path = create_problem(tmp_path, variables)
+    search = ExhaustiveSearch()
+    store = get_store(path)
+    record_suggestion(store, search.next_parameters(path))
+    cursor = search.cursor
+
+    store.iterations[-1]['variables'][0]['lock_value'] = True
+    params = search.next_parameters(path)
+    assert params != EXPLORED_MESSAGE
+    assert params['coffee'] == store.iterations[-1]['variables'][0]['current_value']
+    assert search.cursor != cursor
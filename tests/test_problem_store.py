@@ -0,0 +1,92 @@
+import json
+import pytest
+from app.utils.problem_store import ProblemStore, get_store
+
+
+def iteration(count, value=0):
+    # The store only looks at iteration_count; the rest is carried as it is
+    return {"iteration_count": count, "optimized_variable": {"name": "Utility", "value": value}}
+
+
+def counts(store):
+    return [item['iteration_count'] for item in store.iterations]
+
+
+def test_commit_appends_and_amends(tmp_path):
+    path = str(tmp_path / "problem.jsonl")
+    store = ProblemStore(path)
+    first = iteration(0)
+    store.commit(first)
+    first['optimized_variable']['value'] = 4.5
+    store.commit(first, iteration(1))
+
+    with open(path, 'r') as file:
+        lines = file.read().splitlines()
+    # The result is appended as a new line that amends the first iteration instead of rewriting it
+    assert len(lines) == 3
+    reloaded = ProblemStore(path)
+    assert counts(reloaded) == [0, 1]
+    assert reloaded.iterations[0]['optimized_variable']['value'] == 4.5
+
+
+def test_torn_last_line_is_ignored_and_cut_off(tmp_path):
+    path = str(tmp_path / "problem.jsonl")
+    ProblemStore(path).commit(iteration(0))
+    with open(path, 'ab') as file:
+        file.write(b'{"iteration_count": 1, "varia')
+
+    store = ProblemStore(path)
+    assert counts(store) == [0]
+    store.commit(iteration(1))
+    with open(path, 'r') as file:
+        lines = file.read().splitlines()
+    assert [json.loads(line)['iteration_count'] for line in lines] == [0, 1]
+
+
+def test_bad_line_before_valid_lines_raises(tmp_path):
+    path = str(tmp_path / "problem.jsonl")
+    ProblemStore(path).commit(iteration(0))
+    with open(path, 'a') as file:
+        file.write("not json\n")
+        file.write(json.dumps(iteration(1)) + "\n")
+
+    with pytest.raises(ValueError):
+        ProblemStore(path)
+
+
+def test_commit_keeps_lines_appended_by_another_writer(tmp_path):
+    path = str(tmp_path / "problem.jsonl")
+    mine = ProblemStore(path)
+    mine.commit(iteration(0))
+    ProblemStore(path).commit(iteration(1))
+
+    mine.commit(iteration(2))
+    assert counts(mine) == [0, 1, 2]
+    assert counts(ProblemStore(path)) == [0, 1, 2]
+
+
+def test_refresh_reads_only_new_lines(tmp_path):
+    path = str(tmp_path / "problem.jsonl")
+    store = get_store(path)
+    store.commit(iteration(0))
+    store.indexes['marker'] = True
+    ProblemStore(path).commit(iteration(1))
+
+    assert get_store(path) is store
+    assert counts(store) == [0, 1]
+    # An append does not invalidate the derived indexes
+    assert store.indexes.get('marker')
+
+
+def test_legacy_list_is_migrated_on_first_commit(tmp_path):
+    legacy_path = tmp_path / "problem.json"
+    legacy_path.write_text(json.dumps([iteration(0), iteration(1)]))
+
+    store = ProblemStore(str(legacy_path))
+    assert store.legacy
+    assert counts(store) == [0, 1]
+
+    store.commit(iteration(2))
+    assert not legacy_path.exists()
+    assert store.path == str(tmp_path / "problem.jsonl")
+    assert counts(ProblemStore(store.path)) == [0, 1, 2]
@@ -0,0 +1,44 @@
+import itertools
+from app.utils.state_codec import StateCodec
+
+
+def mixed_variables():
+    return [
+        {"name": "coffee", "type": "Boolean", "possible_values": [True, False], "current_value": True},
+        {"name": "sleep", "type": "Numerical", "possible_values": {"min": 5, "max": 9, "step": 2}, "current_value": 7},
+        {"name": "music", "type": "Categorical", "possible_values": ["jazz", "rock", "none"], "current_value": "rock"},
+    ]
+
+
+def test_every_state_round_trips():
+    codec = StateCodec(mixed_variables())
+    assert codec.size == 2 * 3 * 3
+    states = [dict(zip(codec.names, values)) for values in itertools.product(*codec.domains)]
+    codes = [codec.encode(state) for state in states]
+    assert sorted(codes) == list(range(codec.size))
+    for state, code in zip(states, codes):
+        assert codec.decode(code) == state
+
+
+def test_encode_accepts_an_iteration_and_string_values():
+    codec = StateCodec(mixed_variables())
+    code = codec.encode(mixed_variables())
+    assert codec.decode(code) == {"coffee": True, "sleep": 7, "music": "rock"}
+    assert codec.encode({"coffee": "True", "sleep": "7", "music": "rock"}) == code
+
+
+def test_batch_decoding_matches_single_codes():
+    codec = StateCodec(mixed_variables())
+    codes = list(range(codec.size))
+    assert codec.decode_batch(codes).tolist() == [codec.digits(code) for code in codes]
+    assert codec.encode_batch(codec.decode_batch(codes)).tolist() == codes
+
+
+def test_neighbours_change_one_variable():
+    codec = StateCodec(mixed_variables())
+    code = codec.encode(mixed_variables())
+    for neighbour in codec.neighbours(code):
+        changed = [i for i in range(len(codec.names)) if codec.digit_at(neighbour, i) != codec.digit_at(code, i)]
+        assert len(changed) == 1
+    # Numerical variables only step to the adjacent values
+    assert sorted(codec.value_at(neighbour, 1) for neighbour in codec.neighbours(code, 1)) == [5, 9]